@@ -0,0 +1,165 @@
+# Batch analysis of a file of positions, one FEN or EPD record per line, for running through many positions without
+# the GUI:
+#
+#   python analyse.py positions.epd -d 6 -w 8 -o results.jsonl           each position to depth 6 on 8 processes
+#   python analyse.py positions.epd -t 0.5 -o results.jsonl --resume     half a second each, carrying on a stopped run
+#   cat positions.fen | python analyse.py - -d 4                         from stdin, results to stdout
+#
+# Each result is a JSON line written as soon as the position is done: the line number it came from, the FEN, the EPD
+# id if it had one, the best move, the score in centipawns for the side to move (and mate in moves when there is
+# one), the principal variation, the depth finished, nodes and seconds. Results come in the order the positions
+# finish, not the order they were read, so use the line number to match them up.
+#
+# The input is read as the workers need it, so only a few positions per worker are held in memory however big the
+# file is. Each worker keeps its own transposition table and the positions have nothing to do with each other, so it
+# scales with the number of cores. The output file is the checkpoint: with --resume the line numbers already in it
+# are skipped and new results are added to the end.
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from position import Position, move_to_uci
+from search import Search, MATE, MATE_BOUND
+from transposition import TranspositionTable
+
+IN_FLIGHT = 4  # positions handed to each worker before its results are needed, so none of them waits for work
+
+worker_table = None  # each worker process's own transposition table, kept between positions
+
+
+def init_worker(table_mb):
+    global worker_table
+    worker_table = TranspositionTable(table_mb)
+
+
+def parse_record(text):
+    # (FEN, EPD id or None) from a line of input, or None for a blank or comment line. An EPD record has only the
+    # first four FEN fields followed by operations, e.g. 'r1bqkbnr/... w KQkq - bm Nf3; id "test 1";'
+    fields = text.split()
+    if not fields or fields[0].startswith('#'):
+        return None
+    if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+        return ' '.join(fields[:6]), None
+    fen = ' '.join(fields[:4])
+    operations = dict(operation.strip().split(None, 1) for operation in ' '.join(fields[4:]).split(';')
+                      if len(operation.split()) > 1)
+    fen += ' %s %s' % (operations.get('hmvc', '0'), operations.get('fmvn', '1'))  # the move counters if it has them
+    record_id = operations.get('id')
+    return fen, record_id.strip('"') if record_id is not None else None
+
+
+def read_records(lines, done=()):
+    # (line number, FEN, EPD id) for each position in lines, from 1, skipping the line numbers in done
+    for number, text in enumerate(lines, 1):
+        if number in done:
+            continue
+        record = parse_record(text)
+        if record is not None:
+            yield (number,) + record
+
+
+def analyse_position(number, fen, record_id, depth, movetime, nodes):
+    # the result for one position as a dict, ready to be written as a JSON line
+    result = {'line': number, 'fen': fen}
+    if record_id is not None:
+        result['id'] = record_id
+    try:
+        pos = Position.from_fen(fen)
+    except (ValueError, IndexError, KeyError) as error:
+        result['error'] = 'invalid FEN: %s' % error
+        return result
+    finished = [0]
+
+    def report(finished_depth, score, pv, searched, seconds):
+        finished[0] = finished_depth
+
+    searcher = Search(depth, movetime, nodes, table=worker_table, report=report)
+    start_time = time.perf_counter()
+    move, score = searcher.iterative_deepening(pos)
+    result.update(bestmove=move_to_uci(move) if move is not None else None, score=score,
+                  pv=[move_to_uci(pv_move) for pv_move in searcher.previous_pv], depth=finished[0],
+                  nodes=searcher.nodes, seconds=round(time.perf_counter() - start_time, 3))
+    if abs(score) > MATE_BOUND:  # moves to mate, negative when the side to move is the one being mated
+        result['mate'] = (MATE - score + 1) // 2 if score > 0 else -((MATE + score + 1) // 2)
+    return result
+
+
+def completed_lines(path):
+    # Line numbers with a result in the output file at path, to be skipped when resuming. The file is read a line at
+    # a time. A result cut off part way through writing it (the run was killed) is taken off the end of the file, so
+    # that position is done again
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'rb+') as file:
+        end = 0  # where the last complete line ends
+        for text in file:
+            if not text.endswith(b'\n'):
+                break
+            end += len(text)
+            if text.strip():
+                done.add(json.loads(text)['line'])
+        file.truncate(end)
+    return done
+
+
+def run_batch(lines, output, depth=None, movetime=None, nodes=None, workers=None, table_mb=16, done=()):
+    # Analyses the positions in lines (any iterable of strings, e.g. an open file) on workers processes, default one
+    # per core, writing each result to output as a JSON line. Returns the number of positions analysed
+    workers = workers or os.cpu_count()
+    records = read_records(lines, done)
+    count = 0
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(table_mb,)) as pool:
+        pending = set()
+        while True:
+            for record in records:  # tops the pending positions back up, reading only as much input as that needs
+                pending.add(pool.submit(analyse_position, *record, depth, movetime, nodes))
+                if len(pending) >= IN_FLIGHT * workers:
+                    break
+            if not pending:
+                return count
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                output.write(json.dumps(future.result()) + '\n')
+                count += 1
+            output.flush()  # so a stopped run loses at most the positions being searched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyse a file of FEN or EPD positions, writing JSON lines.')
+    parser.add_argument('input', help="file of positions, one per line, or '-' for stdin")
+    parser.add_argument('-d', '--depth', type=int, help='depth to search each position to')
+    parser.add_argument('-t', '--movetime', type=float, help='seconds to search each position for')
+    parser.add_argument('-n', '--nodes', type=int, help='nodes to search each position for')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--hash', type=float, default=16, help='transposition table size in MB for each worker')
+    parser.add_argument('-o', '--output', help='file to write the results to, default stdout')
+    parser.add_argument('--resume', action='store_true', help='skip the positions already in the output file')
+    args = parser.parse_args(argv)
+    if args.depth is None and args.movetime is None and args.nodes is None:
+        parser.error('give at least one of --depth, --movetime and --nodes')
+    if args.resume and args.output is None:
+        parser.error('--resume needs --output')
+
+    done = completed_lines(args.output) if args.resume else set()
+    source = sys.stdin if args.input == '-' else open(args.input)
+    output = sys.stdout if args.output is None else open(args.output, 'a' if args.resume else 'w')
+    start_time = time.perf_counter()
+    try:
+        count = run_batch(source, output, args.depth, args.movetime, args.nodes, args.workers, args.hash, done)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    seconds = time.perf_counter() - start_time
+    print('%d positions in %.1f seconds (%d skipped as already done)' % (count, seconds, len(done)), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+# Evaluates a batch of positions in one call with NumPy, for jobs that score thousands of leaves at a time. Each term
+# is worked out for the whole batch with array operations instead of a Python loop per position, and the results are
+# exactly what evaluation.tapered_score gives for each position on its own.
+#
+# Boards are either N x 64 int8 piece codes (the same codes and square order as Position.board) or N x 12 x 64 piece
+# planes, white pawn, knight, bishop, rook, queen, king then the black pieces in the same order. Positions need a king
+# of each colour and no pawns on the first or last rank.
+#
+# NumPy is only needed by this module. Nothing else in the engine imports it.
+
+import numpy as np
+
+import evaluation as ev
+import pawns
+from bitboard import FILE_A, FILE_H, knight_attacks, pawn_attacks
+from position import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK
+from psqt import midgame_scores, endgame_scores, piece_phase, MAX_PHASE
+
+ONE = np.uint64(1)
+NOT_FILE_A = np.uint64(~FILE_A & 0xFFFFFFFFFFFFFFFF)
+NOT_FILE_H = np.uint64(~FILE_H & 0xFFFFFFFFFFFFFFFF)
+piece_codes = [piece_type | colour << 3 for colour in (WHITE, BLACK) for piece_type in range(PAWN, KING + 1)]
+
+
+def table(values):
+    return np.array(values, dtype=np.uint64)
+
+
+midgame_table = np.array(midgame_scores, dtype=np.int64)
+endgame_table = np.array(endgame_scores, dtype=np.int64)
+phase_table = np.array(piece_phase, dtype=np.int64)
+square_bits = table([1 << square for square in range(64)])
+knight_table = table(knight_attacks)
+king_zone_table = table(ev.king_zones)
+file_table = table(pawns.file_masks)
+adjacent_table = table([pawns.adjacent_files[square & 7] for square in range(64)])
+passed_tables = [table(masks) for masks in pawns.passed_masks]
+support_tables = [table(masks) for masks in pawns.support_masks]
+front_tables = [table(masks) for masks in pawns.front_files]
+# squares an enemy pawn guards the square in front of the pawn from. 0 on the first and last rank, where pawns can't be
+stop_tables = [table([pawn_attacks[WHITE][square - 8] if 8 <= square < 56 else 0 for square in range(64)]),
+               table([pawn_attacks[BLACK][square + 8] if 8 <= square < 56 else 0 for square in range(64)])]
+pawn_ranks = [np.array([7 - (square >> 3) for square in range(64)]), np.array([square >> 3 for square in range(64)])]
+passed_midgame = np.array(pawns.PASSED_MIDGAME, dtype=np.int64)
+passed_endgame = np.array(pawns.PASSED_ENDGAME, dtype=np.int64)
+mobility_midgame = np.array([0, 0] + [ev.MOBILITY[piece_type][0] for piece_type in range(KNIGHT, KING)],
+                            dtype=np.int64)
+mobility_endgame = np.array([0, 0] + [ev.MOBILITY[piece_type][1] for piece_type in range(KNIGHT, KING)],
+                            dtype=np.int64)
+typical_mobility = np.array(ev.TYPICAL_MOBILITY, dtype=np.int64)
+king_attack_weights = np.array(ev.KING_ATTACK_WEIGHTS, dtype=np.int64)
+
+
+def build_shield_tables():
+    # shield[colour][distance - 1][square]: the squares one or two rows in front of a king on the square, on its file
+    # and the files either side. near_files[square] is those files as a bitmask of file numbers
+    shield = [[[0] * 64, [0] * 64], [[0] * 64, [0] * 64]]
+    near_files = [0] * 64
+    for square in range(64):
+        row, file = square >> 3, square & 7
+        for shield_file in range(max(0, file - 1), min(7, file + 1) + 1):
+            near_files[square] |= 1 << shield_file
+            for colour, step in ((WHITE, -1), (BLACK, 1)):
+                for distance in (1, 2):
+                    shield_row = row + step * distance
+                    if 0 <= shield_row < 8:
+                        shield[colour][distance - 1][square] |= 1 << 8 * shield_row + shield_file
+    return [[table(masks) for masks in by_distance] for by_distance in shield], np.array(near_files, dtype=np.int64)
+
+
+shield_tables, near_files_table = build_shield_tables()
+
+if hasattr(np, 'bitwise_count'):  # NumPy 2
+    def popcount(bitboards):
+        return np.bitwise_count(bitboards).astype(np.int64)
+else:
+    byte_counts = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.int64)
+
+    def popcount(bitboards):
+        bitboards = np.ascontiguousarray(bitboards, dtype=np.uint64)
+        return byte_counts[bitboards.view(np.uint8)].reshape(bitboards.shape + (8,)).sum(axis=-1)
+
+
+def boards_from_positions(positions):  # N x 64 int8 piece codes
+    return np.array([np.frombuffer(pos.board, dtype=np.int8) for pos in positions], dtype=np.int8).reshape(-1, 64)
+
+
+def planes_to_boards(planes):  # N x 12 x 64 piece planes -> N x 64 piece codes
+    planes = np.asarray(planes).astype(bool)
+    codes = np.array(piece_codes, dtype=np.int8)
+    return (planes * codes[None, :, None]).sum(axis=1).astype(np.int8)
+
+
+def to_bitboards(boards):  # N x 16 uint64 bitboards indexed by piece code, like Position.pieces
+    bitboards = np.zeros((len(boards), 16), dtype=np.uint64)
+    for code in piece_codes:
+        bits = np.packbits(boards == code, axis=1, bitorder='little')  # byte j bit i is square 8j + i
+        bitboards[:, code] = np.ascontiguousarray(bits).view('<u8')[:, 0]
+    return bitboards
+
+
+def shift(bitboards, amount, mask):  # positive amounts go up the square indices
+    if amount > 0:
+        return (bitboards << np.uint64(amount)) & mask
+    return (bitboards >> np.uint64(-amount)) & mask
+
+
+ALL = np.uint64(0xFFFFFFFFFFFFFFFF)
+diagonal_steps = ((9, NOT_FILE_A), (7, NOT_FILE_H), (-7, NOT_FILE_A), (-9, NOT_FILE_H))
+straight_steps = ((1, NOT_FILE_A), (-1, NOT_FILE_H), (8, ALL), (-8, ALL))
+
+
+def slide(origins, empty, steps):  # squares attacked by sliders on the origin squares along the steps, up to a blocker
+    attacks = np.zeros_like(origins)
+    for amount, mask in steps:
+        flood = origins
+        ray = origins
+        for _ in range(6):
+            ray = shift(ray, amount, mask) & empty
+            flood = flood | ray
+        attacks |= shift(flood, amount, mask)
+    return attacks
+
+
+def lowest_square(bitboards):  # index of the lowest set bit, for bitboards with a bit set
+    lowest = bitboards & (~bitboards + ONE)
+    return np.log2(lowest.astype(np.float64)).astype(np.int64)  # powers of two are exact as floats
+
+
+def pawn_structure(pieces):  # (midgame, endgame) arrays from white's point of view, as pawns.pawn_scores
+    midgame = np.zeros(len(pieces), dtype=np.int64)
+    endgame = np.zeros(len(pieces), dtype=np.int64)
+    for colour, sign in ((WHITE, 1), (BLACK, -1)):
+        own = pieces[:, PAWN | colour << 3][:, None]
+        enemy = pieces[:, PAWN | (colour ^ 1) << 3][:, None]
+        present = (own & square_bits) != 0  # N x 64
+        isolated = present & ((own & adjacent_table) == 0)
+        backward = present & ~isolated & ((own & support_tables[colour]) == 0) & ((enemy & stop_tables[colour]) != 0)
+        passed = present & ((enemy & passed_tables[colour]) == 0) & ((own & front_tables[colour]) == 0)
+        side_midgame = (-pawns.ISOLATED[0] * isolated.sum(axis=1) - pawns.BACKWARD[0] * backward.sum(axis=1)
+                        + (passed * passed_midgame[pawn_ranks[colour]]).sum(axis=1))
+        side_endgame = (-pawns.ISOLATED[1] * isolated.sum(axis=1) - pawns.BACKWARD[1] * backward.sum(axis=1)
+                        + (passed * passed_endgame[pawn_ranks[colour]]).sum(axis=1))
+        per_file = popcount(own & file_table)  # N x 8
+        extra = np.maximum(per_file - 1, 0).sum(axis=1)
+        files = ((per_file > 0) << np.arange(8)).sum(axis=1)
+        islands = popcount((files & ~(files << 1)).astype(np.uint64))
+        extra_islands = np.maximum(islands - 1, 0)
+        side_midgame -= extra * pawns.DOUBLED[0] + extra_islands * pawns.ISLAND[0]
+        side_endgame -= extra * pawns.DOUBLED[1] + extra_islands * pawns.ISLAND[1]
+        midgame += sign * side_midgame
+        endgame += sign * side_endgame
+    return midgame, endgame
+
+
+def piece_activity(boards, pieces):
+    # (midgame, endgame) arrays from white's point of view for mobility and king safety, as evaluation.mobility and
+    # evaluation.king_safety. Every knight, bishop, rook and queen in the batch is one entry in flat arrays
+    count = len(boards)
+    occupied = np.zeros(count, dtype=np.uint64)
+    sides = [np.zeros(count, dtype=np.uint64), np.zeros(count, dtype=np.uint64)]
+    for code in piece_codes:
+        sides[code >> 3] |= pieces[:, code]
+        occupied |= pieces[:, code]
+    pawn_cover = [shift(pieces[:, PAWN], -9, NOT_FILE_H) | shift(pieces[:, PAWN], -7, NOT_FILE_A),
+                  shift(pieces[:, PAWN | 8], 7, NOT_FILE_H) | shift(pieces[:, PAWN | 8], 9, NOT_FILE_A)]
+    safe = np.stack([~(sides[colour] | pawn_cover[colour ^ 1]) for colour in (WHITE, BLACK)], axis=1)  # N x 2
+    kings = np.stack([lowest_square(pieces[:, KING | colour << 3]) for colour in (WHITE, BLACK)], axis=1)
+
+    types = boards & 7
+    board_index, square = np.nonzero((types >= KNIGHT) & (types <= QUEEN))
+    piece_type = types[board_index, square].astype(np.int64)
+    colour = (boards[board_index, square] >> 3).astype(np.int64)
+    origins = square_bits[square]
+    empty = ~occupied[board_index]
+    diagonal = slide(origins, empty, diagonal_steps)
+    straight = slide(origins, empty, straight_steps)
+    attacks = np.where(piece_type == KNIGHT, knight_table[square],
+                       np.where(piece_type == BISHOP, diagonal,
+                                np.where(piece_type == ROOK, straight, diagonal | straight)))
+
+    sign = 1 - 2 * colour
+    reached = popcount(attacks & safe[board_index, colour]) - typical_mobility[piece_type]
+    midgame = np.bincount(board_index, sign * mobility_midgame[piece_type] * reached, count)
+    endgame = np.bincount(board_index, sign * mobility_endgame[piece_type] * reached, count)
+
+    # attacks on the squares around the enemy king, added up for each (board, attacking colour)
+    near_king = popcount(attacks & king_zone_table[kings[board_index, colour ^ 1]])
+    side = 2 * board_index + colour
+    units = np.bincount(side, king_attack_weights[piece_type] * near_king, 2 * count).astype(np.int64).reshape(-1, 2)
+    attackers = np.bincount(side, near_king > 0, 2 * count).astype(np.int64).reshape(-1, 2)
+    all_pawns = pieces[:, PAWN] | pieces[:, PAWN | 8]
+    all_files = ((popcount(all_pawns[:, None] & file_table) > 0) << np.arange(8)).sum(axis=1)
+    for defender, sign in ((WHITE, 1), (BLACK, -1)):
+        king = kings[:, defender]
+        danger = np.where(attackers[:, defender ^ 1] >= 2,
+                          np.minimum(units[:, defender ^ 1] ** 2, ev.KING_DANGER_LIMIT), 0)
+        own_pawns = pieces[:, PAWN | defender << 3]
+        shield = (ev.SHIELD[0] * popcount(own_pawns & shield_tables[defender][0][king])
+                  + ev.SHIELD[1] * popcount(own_pawns & shield_tables[defender][1][king]))
+        own_files = ((popcount(own_pawns[:, None] & file_table) > 0) << np.arange(8)).sum(axis=1)
+        near = near_files_table[king]
+        semi_open = popcount((near & ~own_files).astype(np.uint64))
+        fully_open = popcount((near & ~all_files).astype(np.uint64))
+        midgame += sign * (shield - danger - ev.SEMI_OPEN_FILE * semi_open - ev.OPEN_FILE * fully_open)
+    return midgame.astype(np.int64), endgame.astype(np.int64)
+
+
+def evaluate_batch(boards, colours=None):
+    # Centipawns for each board: from white's point of view, or from the side to move's like evaluation.evaluate when
+    # colours (0 for white to move, 1 for black) is given. boards is N x 64 piece codes or N x 12 x 64 piece planes
+    boards = np.asarray(boards)
+    if boards.ndim == 3:
+        boards = planes_to_boards(boards)
+    boards = boards.astype(np.int8)
+    pieces = to_bitboards(boards)
+    codes = boards.astype(np.int64)
+    midgame = midgame_table[codes, np.arange(64)].sum(axis=1)
+    endgame = endgame_table[codes, np.arange(64)].sum(axis=1)
+    phase = np.minimum(phase_table[codes].sum(axis=1), MAX_PHASE)
+    pawn_midgame, pawn_endgame = pawn_structure(pieces)
+    activity_midgame, activity_endgame = piece_activity(boards, pieces)
+    midgame += pawn_midgame + activity_midgame
+    endgame += pawn_endgame + activity_endgame
+    blended = midgame * phase + endgame * (MAX_PHASE - phase)
+    scores = np.sign(blended) * (np.abs(blended) // MAX_PHASE)  # rounds towards 0 like int() in tapered_score
+    if colours is not None:
+        scores = np.where(np.asarray(colours) == BLACK, -scores, scores)
+    return scores
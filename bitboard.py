@@ -0,0 +1,326 @@
+# Bitboard move generator. Works on the bitboards kept in a Position (bit n is square n, a8 = 0 and h1 = 63) and
+# produces the legal moves of the side to move as ints from position.encode_move.
+# Knight, king and pawn attacks come from tables built once at import. Sliding attacks use a ray table per direction:
+# the ray is cut off behind the first blocker, found with a single lowest/highest set bit lookup.
+
+from position import (EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, WHITE_KINGSIDE, WHITE_QUEENSIDE,
+                      BLACK_KINGSIDE, BLACK_QUEENSIDE, encode_move, decode_move, make_move)
+
+FULL = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+ROW_3 = 0xFF << 40  # row 5 (rank 3), the square white pawns land on after their first step
+ROW_6 = 0xFF << 16  # row 2 (rank 6), the same for black
+PROMOTION_ROWS = 0xFF | 0xFF << 56
+
+
+def build_step_table(offsets):
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        bb = 0
+        for dr, dc in offsets:
+            r, c = row + dr, col + dc
+            if 0 <= r < 8 and 0 <= c < 8:
+                bb |= 1 << (8 * r + c)
+        table.append(bb)
+    return table
+
+
+def build_ray_table(dr, dc):
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        bb = 0
+        r, c = row + dr, col + dc
+        while 0 <= r < 8 and 0 <= c < 8:
+            bb |= 1 << (8 * r + c)
+            r, c = r + dr, c + dc
+        table.append(bb)
+    return table
+
+
+knight_attacks = build_step_table(((1, 2), (-1, 2), (1, -2), (-1, -2), (2, 1), (-2, 1), (2, -1), (-2, -1)))
+king_attacks = build_step_table(((-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0)))
+# pawn_attacks[colour][square] is the squares a pawn of that colour on that square attacks
+pawn_attacks = [build_step_table(((-1, -1), (-1, 1))), build_step_table(((1, -1), (1, 1)))]
+
+# rays that go up the square indices (right, down) have their nearest blocker at the lowest set bit, rays going
+# down the indices (left, up) at the highest set bit
+east, south, south_east, south_west = (build_ray_table(0, 1), build_ray_table(1, 0), build_ray_table(1, 1),
+                                       build_ray_table(1, -1))
+west, north, north_west, north_east = (build_ray_table(0, -1), build_ray_table(-1, 0), build_ray_table(-1, -1),
+                                       build_ray_table(-1, 1))
+
+
+def count(bb):  # number of set bits
+    return bin(bb).count('1')
+
+
+def squares(bb):  # yields the index of each set bit
+    while bb:
+        lowest = bb & -bb
+        yield lowest.bit_length() - 1
+        bb ^= lowest
+
+
+def build_line_tables():
+    # between[a][b] is the squares strictly between a and b and line[a][b] the whole line (edge to edge) through them,
+    # when a and b share a row, column or diagonal. Both are 0 otherwise
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    opposites = ((east, west), (west, east), (south, north), (north, south), (south_east, north_west),
+                 (north_west, south_east), (south_west, north_east), (north_east, south_west))
+    for a in range(64):
+        for rays, opposite_rays in opposites:
+            for b in squares(rays[a]):
+                between[a][b] = rays[a] & opposite_rays[b]
+                line[a][b] = rays[a] | opposite_rays[a] | 1 << a
+    return between, line
+
+
+between, line = build_line_tables()
+
+
+def rook_attacks(square, occupied):
+    attacks = 0
+    for rays in (east, south):
+        ray = rays[square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for rays in (west, north):
+        ray = rays[square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def bishop_attacks(square, occupied):
+    attacks = 0
+    for rays in (south_east, south_west):
+        ray = rays[square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for rays in (north_west, north_east):
+        ray = rays[square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def is_attacked(pos, square, by_colour, occupied, removed=0):
+    # Is the square attacked by a piece of by_colour? occupied and removed (enemy pieces captured by the move being
+    # tested) let this answer the question for the position after a move without making it
+    pieces = pos.pieces
+    c = by_colour << 3
+    keep = ~removed
+    if knight_attacks[square] & pieces[KNIGHT | c] & keep or king_attacks[square] & pieces[KING | c] \
+            or pawn_attacks[by_colour ^ 1][square] & pieces[PAWN | c] & keep:
+        return True
+    queens = pieces[QUEEN | c]
+    if bishop_attacks(square, occupied) & (pieces[BISHOP | c] | queens) & keep:
+        return True
+    return bool(rook_attacks(square, occupied) & (pieces[ROOK | c] | queens) & keep)
+
+
+def attackers_to(pos, square, occupied):
+    # Every piece of either colour attacking the square, as a bitboard. AND it with pos.occupied[colour] for one side.
+    # occupied decides which sliders are blocked, so removing pieces from it uncovers the x-ray attackers behind them
+    pieces = pos.pieces
+    diagonal = pieces[BISHOP] | pieces[BISHOP | 8] | pieces[QUEEN] | pieces[QUEEN | 8]
+    straight = pieces[ROOK] | pieces[ROOK | 8] | pieces[QUEEN] | pieces[QUEEN | 8]
+    return (knight_attacks[square] & (pieces[KNIGHT] | pieces[KNIGHT | 8])
+            | king_attacks[square] & (pieces[KING] | pieces[KING | 8])
+            | pawn_attacks[BLACK][square] & pieces[PAWN] | pawn_attacks[WHITE][square] & pieces[PAWN | 8]
+            | bishop_attacks(square, occupied) & diagonal | rook_attacks(square, occupied) & straight) & occupied
+
+
+def pawn_attack_map(pawns, colour):  # every square attacked by the pawns of colour
+    if colour == WHITE:
+        return (pawns & ~FILE_A) >> 9 | (pawns & ~FILE_H) >> 7
+    return ((pawns & ~FILE_A) << 7 | (pawns & ~FILE_H) << 9) & FULL
+
+
+def attack_map(pos, colour, occupied):  # every square attacked by the pieces of colour
+    pieces = pos.pieces
+    c = colour << 3
+    attacks = pawn_attack_map(pieces[PAWN | c], colour)
+    for square in squares(pieces[KNIGHT | c]):
+        attacks |= knight_attacks[square]
+    queens = pieces[QUEEN | c]
+    for square in squares(pieces[BISHOP | c] | queens):
+        attacks |= bishop_attacks(square, occupied)
+    for square in squares(pieces[ROOK | c] | queens):
+        attacks |= rook_attacks(square, occupied)
+    for square in squares(pieces[KING | c]):
+        attacks |= king_attacks[square]
+    return attacks
+
+
+def pseudo_legal_moves(pos, captures_only=False):
+    # captures_only leaves out everything except captures and promotions, for the quiescence search
+    moves = []
+    colour = pos.colour
+    c = colour << 3
+    pieces = pos.pieces
+    own = pos.occupied[colour]
+    enemy = pos.occupied[colour ^ 1]
+    occupied = own | enemy
+    empty = ~occupied & FULL
+
+    # pawns are generated a whole set at a time by shifting the pawn bitboard
+    pawns = pieces[PAWN | c]
+    if colour == WHITE:
+        single = pawns >> 8 & empty
+        double = (single & ROW_3) >> 8 & empty
+        push, left, right = -8, -9, -7
+        left_captures = (pawns & ~FILE_A) >> 9
+        right_captures = (pawns & ~FILE_H) >> 7
+    else:
+        single = pawns << 8 & empty
+        double = (single & ROW_6) << 8 & empty
+        push, left, right = 8, 7, 9
+        left_captures = (pawns & ~FILE_A) << 7 & FULL
+        right_captures = (pawns & ~FILE_H) << 9 & FULL
+    if captures_only:
+        single &= PROMOTION_ROWS
+        double = 0
+    targets = enemy
+    if pos.en_passant is not None:
+        targets |= 1 << pos.en_passant
+    for bb, step in ((single, push), (left_captures & targets, left), (right_captures & targets, right)):
+        for end in squares(bb & ~PROMOTION_ROWS):
+            moves.append(encode_move(end - step, end))
+        for end in squares(bb & PROMOTION_ROWS):
+            for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                moves.append(encode_move(end - step, end, promotion))
+    for end in squares(double):
+        moves.append(encode_move(end - 2 * push, end))
+
+    not_own = enemy if captures_only else ~own
+    for start in squares(pieces[KNIGHT | c]):
+        for end in squares(knight_attacks[start] & not_own):
+            moves.append(start | end << 6)
+    for start in squares(pieces[BISHOP | c]):
+        for end in squares(bishop_attacks(start, occupied) & not_own):
+            moves.append(start | end << 6)
+    for start in squares(pieces[ROOK | c]):
+        for end in squares(rook_attacks(start, occupied) & not_own):
+            moves.append(start | end << 6)
+    for start in squares(pieces[QUEEN | c]):
+        for end in squares((rook_attacks(start, occupied) | bishop_attacks(start, occupied)) & not_own):
+            moves.append(start | end << 6)
+    for start in squares(pieces[KING | c]):
+        for end in squares(king_attacks[start] & not_own):
+            moves.append(start | end << 6)
+        if not captures_only:
+            moves.extend(castling_moves(pos, start, occupied))
+    return moves
+
+
+def castling_moves(pos, king, occupied):
+    moves = []
+    enemy_colour = pos.colour ^ 1
+    if pos.colour == WHITE:
+        kingside, queenside = WHITE_KINGSIDE, WHITE_QUEENSIDE
+    else:
+        kingside, queenside = BLACK_KINGSIDE, BLACK_QUEENSIDE
+    # the king can't castle out of, through or into check
+    if pos.castling & kingside and not occupied & (6 << king) \
+            and not any(is_attacked(pos, square, enemy_colour, occupied) for square in (king, king + 1, king + 2)):
+        moves.append(encode_move(king, king + 2))
+    if pos.castling & queenside and not occupied & (7 << (king - 3)) \
+            and not any(is_attacked(pos, square, enemy_colour, occupied) for square in (king, king - 1, king - 2)):
+        moves.append(encode_move(king, king - 2))
+    return moves
+
+
+def leaves_king_in_check(pos, move):
+    # Tests the move by changing the occupancy instead of making it
+    start, end, promotion = decode_move(move)
+    colour = pos.colour
+    piece = pos.board[start]
+    occupied = (pos.occupied[WHITE] | pos.occupied[BLACK]) & ~(1 << start) | 1 << end
+    removed = 1 << end
+    if piece & 7 == PAWN and end == pos.en_passant:
+        captured_pawn = end + 8 if colour == WHITE else end - 8
+        occupied &= ~(1 << captured_pawn)
+        removed = 1 << captured_pawn
+    if piece & 7 == KING:
+        king = end
+    else:
+        king = (pos.pieces[KING | colour << 3] & -pos.pieces[KING | colour << 3]).bit_length() - 1
+    return is_attacked(pos, king, colour ^ 1, occupied, removed)
+
+
+def legal_moves(pos, captures_only=False):
+    # Pseudo-legal moves filtered against the checkers, the pinned pieces and the squares the king can't go to, which
+    # are all found once for the position instead of testing every move
+    colour = pos.colour
+    enemy_colour = colour ^ 1
+    c, e = colour << 3, enemy_colour << 3
+    pieces = pos.pieces
+    king_bb = pieces[KING | c]
+    king = king_bb.bit_length() - 1
+    own = pos.occupied[colour]
+    occupied = own | pos.occupied[enemy_colour]
+    enemy_diagonal = pieces[BISHOP | e] | pieces[QUEEN | e]
+    enemy_straight = pieces[ROOK | e] | pieces[QUEEN | e]
+    checkers = (knight_attacks[king] & pieces[KNIGHT | e] | pawn_attacks[colour][king] & pieces[PAWN | e]
+                | bishop_attacks(king, occupied) & enemy_diagonal | rook_attacks(king, occupied) & enemy_straight)
+    danger = attack_map(pos, enemy_colour, occupied ^ king_bb)  # without the king so it can't step back along a ray
+    if checkers & (checkers - 1):  # double check, only the king can move
+        targets = pos.occupied[enemy_colour] if captures_only else ~own
+        return [king | end << 6 for end in squares(king_attacks[king] & targets & ~danger)]
+    if checkers:  # capture the checking piece or block it
+        target = checkers | between[king][checkers.bit_length() - 1]
+    else:
+        target = FULL
+    pinned = 0
+    for sniper in squares(bishop_attacks(king, 0) & enemy_diagonal | rook_attacks(king, 0) & enemy_straight):
+        blockers = between[king][sniper] & occupied
+        if blockers & own and not blockers & (blockers - 1):  # exactly one piece in the way and it is ours
+            pinned |= blockers
+    king_lines = line[king]
+    en_passant = pos.en_passant
+    board = pos.board
+    moves = []
+    for move in pseudo_legal_moves(pos, captures_only):
+        start = move & 63
+        end = move >> 6 & 63
+        if start == king:  # castling has already been checked for attacked squares
+            if not danger >> end & 1:
+                moves.append(move)
+        elif end == en_passant and board[start] & 7 == PAWN:
+            # en passant takes two pieces off one row, which can uncover a check no pin test sees
+            if not leaves_king_in_check(pos, move):
+                moves.append(move)
+        elif target >> end & 1 and (not pinned >> start & 1 or king_lines[start] >> end & 1):
+            moves.append(move)
+    return moves
+
+
+def make_position(pos, move):  # copy of the position with the move made, for callers that keep every position
+    new_pos = pos.copy()
+    make_move(new_pos, move)
+    return new_pos
+
+
+def in_check(pos, colour):
+    king_bb = pos.pieces[KING | colour << 3]
+    return is_attacked(pos, king_bb.bit_length() - 1, colour ^ 1, pos.occupied[WHITE] | pos.occupied[BLACK])
+
+
+def available_moves(pos, row, col):
+    # Same shape of answer as rules.available_moves(row, col, fen, True), for callers that work square by square
+    start = 8 * row + col
+    return [divmod(move >> 6 & 63, 8) for move in legal_moves(pos)
+            if move & 63 == start and move >> 12 in (EMPTY, QUEEN)]  # one entry per square, not per promotion
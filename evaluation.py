@@ -1,143 +1,141 @@
-from collections import deque
-
-import board as b
-
-
-class Node:
-    def __init__(self, position, evaluation=0):  # default argument 'None'
-        self.evaluation = evaluation
-        self.children = []
-        self.position = position
-        self.player_turn = b.find_colour(position)[0]
-
-    def add_child(self, node):
-        self.children.append(node)
-
-
-def find_starting_squares(position):
-    # this function should efficiently find rows and columns of all pieces of the side to move
-    len_fen_pieces = b.find_colour(position)[2] - 1
-    player_turn = b.find_colour(position)[0]
-    starting_squares = []
-    if player_turn == 'w':
-        white_turn = True
-    else:
-        white_turn = False
-    r, c = 0, 0
-    for x in range(len_fen_pieces):
-        y = position[x]
-        if y.isdigit():
-            c = c + int(y)
-        elif y == "/":
-            r += 1
-            c = 0
-        elif y.isalpha() and white_turn == y.isupper():  # check the piece is the colour of the player's turn
-            starting_squares.append((r, c))
-            c += 1
-    return starting_squares
+import time
+
+from bitboard import (FULL, count, squares, knight_attacks, king_attacks, bishop_attacks, rook_attacks,
+                      pawn_attack_map)
+from position import Position, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from pawns import PawnTable, file_masks
+from psqt import MAX_PHASE
+
+pawn_table = PawnTable()
+
+# (midgame, endgame) centipawns for each square a piece can go to that isn't defended by an enemy pawn, counted from
+# a typical number of squares for the piece, so a piece with fewer than that is a penalty
+MOBILITY = [None, None, (4, 4), (5, 5), (2, 4), (1, 2)]
+TYPICAL_MOBILITY = [0, 0, 4, 6, 7, 13]
+# the king zone is the king's square and the squares around it. Each attack on it adds the attacker's weight to the
+# attack units, and the midgame penalty is units squared, once at least two pieces are attacking
+KING_ATTACK_WEIGHTS = [0, 0, 2, 2, 3, 5]
+KING_DANGER_LIMIT = 500
+SHIELD = (10, 5)  # midgame bonus for each pawn one and two squares in front of the king on its file and either side
+SEMI_OPEN_FILE = 15  # midgame penalty for each of those files with none of the king's own pawns
+OPEN_FILE = 10  # more when the file has no pawns at all
+
+king_zones = [king_attacks[square] | 1 << square for square in range(64)]
+
+
+def attack_maps(pos):
+    # The squares attacked by each knight, bishop, rook and queen, as a list of (piece type, attacks) for each side.
+    # Mobility and king safety both work from this, so the sliding attacks are only worked out once per evaluation
+    occupied = pos.occupied[WHITE] | pos.occupied[BLACK]
+    pieces = pos.pieces
+    maps = []
+    for colour in (WHITE, BLACK):
+        c = colour << 3
+        attacks = [(KNIGHT, knight_attacks[square]) for square in squares(pieces[KNIGHT | c])]
+        attacks += [(BISHOP, bishop_attacks(square, occupied)) for square in squares(pieces[BISHOP | c])]
+        attacks += [(ROOK, rook_attacks(square, occupied)) for square in squares(pieces[ROOK | c])]
+        attacks += [(QUEEN, bishop_attacks(square, occupied) | rook_attacks(square, occupied))
+                    for square in squares(pieces[QUEEN | c])]
+        maps.append(attacks)
+    return maps
+
+
+def mobility(pos, maps):  # (midgame, endgame) from white's point of view
+    scores = [[0, 0], [0, 0]]
+    for colour in (WHITE, BLACK):
+        enemy = colour ^ 1
+        safe = ~(pos.occupied[colour] | pawn_attack_map(pos.pieces[PAWN | enemy << 3], enemy)) & FULL
+        score = scores[colour]
+        for piece_type, attacks in maps[colour]:
+            squares_reached = count(attacks & safe) - TYPICAL_MOBILITY[piece_type]
+            score[0] += MOBILITY[piece_type][0] * squares_reached
+            score[1] += MOBILITY[piece_type][1] * squares_reached
+    return scores[WHITE][0] - scores[BLACK][0], scores[WHITE][1] - scores[BLACK][1]
+
+
+def king_safety(pos, maps):
+    # (midgame, endgame) from white's point of view: pieces attacking the squares around each king, the pawns in
+    # front of it and open files next to it. Only counts in the midgame
+    pieces = pos.pieces
+    all_pawns = pieces[PAWN] | pieces[PAWN | 8]
+    scores = [0, 0]
+    for colour in (WHITE, BLACK):
+        king = pieces[KING | colour << 3]
+        if not king:
+            continue
+        square = king.bit_length() - 1
+        zone = king_zones[square]
+        units = attackers = 0
+        for piece_type, attacks in maps[colour ^ 1]:
+            if attacks & zone:
+                attackers += 1
+                units += KING_ATTACK_WEIGHTS[piece_type] * count(attacks & zone)
+        score = -min(units * units, KING_DANGER_LIMIT) if attackers >= 2 else 0
+
+        own_pawns = pieces[PAWN | colour << 3]
+        row, file = square >> 3, square & 7
+        step = -1 if colour == WHITE else 1  # rows towards the other side
+        for shield_file in range(max(0, file - 1), min(7, file + 1) + 1):
+            file_pawns = own_pawns & file_masks[shield_file]
+            for distance in (1, 2):
+                shield_row = row + step * distance
+                if 0 <= shield_row < 8 and file_pawns >> (8 * shield_row + shield_file) & 1:
+                    score += SHIELD[distance - 1]
+            if not file_pawns:
+                score -= SEMI_OPEN_FILE
+                if not all_pawns & file_masks[shield_file]:
+                    score -= OPEN_FILE
+        scores[colour] = score
+    return scores[WHITE] - scores[BLACK], 0
+
+
+def tapered_score(pos):
+    # centipawns from white's point of view: the material and piece-square sums Position keeps plus pawn structure,
+    # mobility and king safety, blended from the midgame to the endgame score as pieces come off
+    pawn_midgame, pawn_endgame = pawn_table.lookup(pos)
+    maps = attack_maps(pos)
+    mobility_midgame, mobility_endgame = mobility(pos, maps)
+    king_midgame, king_endgame = king_safety(pos, maps)
+    midgame = pos.midgame + pawn_midgame + mobility_midgame + king_midgame
+    endgame = pos.endgame + pawn_endgame + mobility_endgame + king_endgame
+    phase = min(pos.phase, MAX_PHASE)
+    return int((midgame * phase + endgame * (MAX_PHASE - phase)) / MAX_PHASE)
+
+
+def term_timings(positions, repeat=10):
+    # Seconds spent on each part of the evaluation over the positions, to see where evaluation time goes. The pawn
+    # table is cleared first so its time includes working out the structures that aren't cached yet
+    pawn_table.clear()
+    timings = {'pawns': 0, 'attack maps': 0, 'mobility': 0, 'king safety': 0}
+    for _ in range(repeat):
+        for pos in positions:
+            start = time.perf_counter()
+            pawn_table.lookup(pos)
+            after_pawns = time.perf_counter()
+            maps = attack_maps(pos)
+            after_maps = time.perf_counter()
+            mobility(pos, maps)
+            after_mobility = time.perf_counter()
+            king_safety(pos, maps)
+            end = time.perf_counter()
+            timings['pawns'] += after_pawns - start
+            timings['attack maps'] += after_maps - after_pawns
+            timings['mobility'] += after_mobility - after_maps
+            timings['king safety'] += end - after_mobility
+    return timings
+
+
+def evaluate(pos):  # centipawns from the point of view of the side to move, which is what the search wants
+    score = tapered_score(pos)
+    return score if pos.colour == WHITE else -score
 
 
 def evaluate_position(position):
     # all calculations comparative e.g. king safety compared between sides
-    def count_material():
-        len_fen_pieces = b.find_colour(position)[2] - 1
-        piece_dict = {'p': 1, 'k': 2, 'n': 3, 'b': 3.2, 'r': 5, 'q': 9}
-        result = 0
-        for x in range(len_fen_pieces):
-            y = position[x]
-            if y.isalpha() and y.isupper():
-
-                value = piece_dict[y.lower()]
-                result += value
-            elif y.isalpha() and y.islower():
-                value = -piece_dict[y]
-                result += value
-        return result
-
-    def king_safety():
-        """" pawn shield
-        no open file 
-        not in center of board
-        luft
-        king tropism
-        scale based on number of pieces 
-        """""
-        pass
-
-    def pawn_structure():
-        """" look at isolated, passed and double pawns
-         count pawn islands and pawn majorities
-         advanced : use a hash table of different pawn structures """""
-        pass
-
-    def available_moves():
-        """" the more moves you have available relative to your opponent the better 
-        will need to test this to see how much I want it to affect the evaluation """""
-        # I always find when playing the computer it restricts my pieces to the extent just want to resign
-        pass
-
-    def quiescence_search():
-        """" If there are any captures (not a pawn?) create a tree for these positions 
-        and evaluate when there is no longer any captures """""
-        pass
-
-    def is_checkmate():  # maybe there's something in board like game_end that can help here
-        pass
-
-    evaluation = count_material()
-
-    return evaluation
+    # position is a FEN string or a Position. The result is in pawns from white's point of view
+    if not isinstance(position, Position):
+        position = Position.from_fen(position)
 
+    evaluation = tapered_score(position) / 100
 
-def minimax(root, depth):
-    if depth == 0:
-        return root.evaluation
-    elif not root.children:
-        # need to get the right evaluation for a game ending position which wasn't evaluated when the tree was created
-        colour, enemy_colour = b.find_colour(root.position)[0], b.find_colour(root.position)[1]
-        if b.square_attacked(b.locate_king(colour, root.position), enemy_colour, root.position) is True:
-            return float('inf')
-        else:
-            return 0  # position is stalemate
-    elif b.find_colour(root.position)[0] == 'w':
-        value = float('-inf')
-        for child in root.children:
-            value = max(value, minimax(child, depth - 1))
-    else:
-        value = float('inf')
-        for child in root.children:
-            value = min(value, minimax(child, depth - 1))
-    return value
-
-
-def build_tree(root, depth):
-    # BFS adding all the positions to a tree
-    position_queue = deque()
-    depth_queue = deque()
-    position_queue.append(root)
-    depth_queue.append(0)
-    while len(position_queue) != 0:
-        current_node = position_queue.popleft()  # popleft so that first in first out
-        current_depth = depth_queue.popleft()
-        if current_depth == depth:  # won't be adding children to maximum depth nodes
-            break
-        for starting_square in find_starting_squares(current_node.position):
-            for square in b.available_moves(starting_square[0], starting_square[1], current_node.position, True):
-                # HAVEN'T CONSIDERED STALEMATE, 3-FOLD REPETITION OR 50 MOVE RULE
-                move = [starting_square, square]
-                child_fen = b.update_fen(current_node.position, move)
-                child = Node(child_fen)
-                current_node.add_child(child)
-                position_queue.append(child)
-                depth_queue.append(current_depth + 1)
-    # Evaluating bottom layer of nodes. Notice the only elements in the position_queue are the bottom nodes
-    for node in position_queue:
-        node.evaluation = round(evaluate_position(node.position), 1)
-    return root
-
-
-def run_evaluation(position):
-    depth = 2  # these are half moves
-    root = Node(position)
-    build_tree(root, depth)
-    return minimax(root, depth)
+    return evaluation
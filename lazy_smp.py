@@ -0,0 +1,151 @@
+# Lazy SMP: several processes search the same position at the same time and share nothing but the transposition
+# table, which lives in shared memory. The helpers do no useful work on their own, but what they store in the table
+# lets the main search cut off earlier and order its moves better, so it gets to its depth sooner. Every other helper
+# starts a depth ahead of the main search so they aren't all searching the same tree in the same order.
+#
+#   python lazy_smp.py "<fen>" -d 6 -w 4       time to depth 6 with 4 processes against 1, and nodes per second
+#
+# There are no locks. Entries are stored as key XOR data (see transposition.py), so an entry torn by two processes
+# writing it at once fails the key check and is treated as a miss.
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+
+from position import Position, START_FEN, move_to_uci
+from search import Search
+from transposition import TranspositionTable, table_bytes
+
+
+class HelperSearch(Search):
+    # a search that also stops once the main search has finished
+    def __init__(self, stop_event, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stop_event = stop_event
+
+    def check_limits(self):
+        super().check_limits()
+        if self.nodes & 127 == 0 and self.stop_event.is_set():  # often, so the next search can start soon
+            self.stopped = True
+
+
+def helper(worker, memory_name, size_mb, jobs, stop_event, results):
+    # Runs in a helper process until it is sent None: searches each (FEN, history, age) job from jobs until stop_event
+    # is set, then puts (worker, nodes, seconds) on results. age is the table age the main search is using
+    memory = shared_memory.SharedMemory(name=memory_name)
+    table = TranspositionTable(size_mb, memory.buf)
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        fen, history, age = job
+        searcher = HelperSearch(stop_event, history=history, table=table)
+        start_time = time.perf_counter()
+        if not stop_event.is_set():  # the main search may already be over if this process was slow to start
+            table.age = (age - 1) & 63  # new_search at the start of iterative_deepening moves it on to age
+            searcher.iterative_deepening(Position.from_fen(fen), 1 + worker % 2)
+        results.put((worker, searcher.nodes, time.perf_counter() - start_time))
+    table.close()
+    memory.close()
+
+
+class Helpers:
+    # count helper processes searching with the table in memory (a SharedMemory). They are started once and kept
+    # between searches, waiting for the next position, so a search doesn't pay for starting processes. They are
+    # spawned rather than forked, since a fork copies locks held by other threads (e.g. the UCI front end blocked
+    # reading stdin) and the helper can then hang on them
+    def __init__(self, memory, size_mb, count):
+        context = multiprocessing.get_context('spawn')
+        self.stop_event = context.Event()
+        self.results = context.Queue()
+        self.jobs = [context.Queue() for _ in range(count)]  # one each, so every helper gets every position
+        self.processes = [context.Process(target=helper, args=(worker, memory.name, size_mb, jobs, self.stop_event,
+                                                               self.results), daemon=True)
+                          for worker, jobs in enumerate(self.jobs, 1)]
+        for process in self.processes:
+            process.start()
+        self.searching = False
+
+    def start(self, fen, history, age):
+        # Starts the helpers searching the position. age is the table age the main search will use, one more than
+        # the table's age before its iterative_deepening
+        self.wait()
+        self.stop_event.clear()
+        for jobs in self.jobs:
+            jobs.put((fen, tuple(history), age))
+        self.searching = True
+
+    def stop(self):  # tells the helpers to stop without waiting for them
+        self.stop_event.set()
+
+    def wait(self):  # stops the search and returns (worker, nodes, seconds) for each helper
+        if not self.searching:
+            return []
+        self.stop_event.set()
+        stats = [self.results.get() for _ in self.processes]
+        self.searching = False
+        return stats
+
+    def close(self):
+        self.wait()
+        for jobs in self.jobs:
+            jobs.put(None)
+        for process in self.processes:
+            process.join()
+
+
+def lazy_smp_search(position, depth, workers=None, history=(), size_mb=16):
+    # Searches to depth with workers processes (default one per core) sharing a transposition table. Returns the main
+    # search's best move, score and principal variation, the seconds it took and (worker, nodes, seconds) for each
+    # process, the main search being worker 0
+    pos = Position.from_fen(position) if isinstance(position, str) else position.copy()
+    fen = pos.to_fen()
+    history = tuple(history)
+    memory = shared_memory.SharedMemory(create=True, size=table_bytes(size_mb))  # new shared memory is zeroed
+    table = TranspositionTable(size_mb, memory.buf)
+    helpers = None
+    try:
+        helpers = Helpers(memory, size_mb, (workers or os.cpu_count()) - 1)
+        helpers.start(fen, history, (table.age + 1) & 63)
+        searcher = Search(depth, history=history, table=table)
+        start_time = time.perf_counter()
+        move, score = searcher.iterative_deepening(pos)
+        seconds = time.perf_counter() - start_time
+        stats = [(0, searcher.nodes, seconds)] + helpers.wait()
+    finally:
+        if helpers is not None:
+            helpers.close()
+        table.close()
+        memory.close()
+        memory.unlink()
+    return move, score, searcher.previous_pv, seconds, sorted(stats)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Lazy SMP search compared with a single process.')
+    parser.add_argument('fen', nargs='?', default=START_FEN)
+    parser.add_argument('-d', '--depth', type=int, default=6)
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--hash', type=float, default=16, help='transposition table size in MB')
+    args = parser.parse_args(argv)
+
+    runs = {}
+    for workers in sorted({1, args.workers}):
+        move, score, pv, seconds, stats = lazy_smp_search(args.fen, args.depth, workers, size_mb=args.hash)
+        runs[workers] = seconds
+        print('%d process%s: %s score %d, depth %d in %.2f seconds, pv %s'
+              % (workers, '' if workers == 1 else 'es', move_to_uci(move), score, args.depth, seconds,
+                 ' '.join(move_to_uci(pv_move) for pv_move in pv)))
+        for worker, nodes, worker_seconds in stats:
+            print('    worker %d: %9d nodes %8.0f nps'
+                  % (worker, nodes, nodes / worker_seconds if worker_seconds else 0))
+    print('time to depth %d speedup with %d processes: %.2f' % (args.depth, args.workers,
+                                                                 runs[1] / runs[args.workers]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# Root split parallel search. Each depth of the iterative deepening searches the first root move (the best move of the
+# last depth) on its own to get a score to beat, then hands the other root moves out to a pool of worker processes.
+# The best score found so far is shared, so a move that starts later is searched with a narrower window. Every worker
+# has its own transposition table, cleared for each root move.
+#
+#   python parallel.py "<fen>" -d 5 -w 4       searches with 4 workers and then 1 core, and compares them
+#
+# Of moves with the same score the earliest in the root move order is kept, and one that may tie the best score but
+# was only searched against a higher bound is searched again, so the result doesn't depend on which worker finishes
+# first. The root moves are ordered with the last depth's best move first, then captures, but without the killer moves
+# and history scores a single core search has built up by then, so when moves tie it can pick a different one.
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import bitboard as bb
+from position import Position, START_FEN, make_move, move_to_uci
+from search import Search, INFINITY, MATE, MATE_BOUND
+from transposition import TranspositionTable
+
+worker_table = None  # each worker process's own transposition table
+shared_alpha = None  # best root score found so far in the depth being searched
+
+
+def init_worker(alpha, table_mb):
+    global worker_table, shared_alpha
+    worker_table = TranspositionTable(table_mb)
+    shared_alpha = alpha
+
+
+def search_move(fen, history, move, depth, alpha, previous_pv):
+    # Score of one root move searched to depth, at least alpha or the shared alpha if that is higher. Returns
+    # (move, score, the alpha it was searched against, principal variation, nodes). The worker's table is cleared
+    # first, so it only holds what was learnt from this move and the result is the same whichever moves the worker
+    # was given before
+    pos = Position.from_fen(fen)
+    worker_table.clear()
+    searcher = Search(depth, history=history, table=worker_table)
+    searcher.depth = depth
+    searcher.previous_pv = previous_pv
+    searcher.keys.append(pos.key)
+    alpha = max(alpha, shared_alpha.value)
+    make_move(pos, move)
+    searcher.keys.append(pos.key)
+    score = -searcher.negamax(pos, depth - 1, -INFINITY, -alpha, 1, bool(previous_pv) and move == previous_pv[0])
+    return move, score, alpha, [move] + searcher.pv[1], searcher.nodes
+
+
+def parallel_search(position, depth, workers=None, history=(), table_mb=16):
+    # Best move, its score, the principal variation and the nodes searched by all the workers, searching to depth with
+    # workers processes (default one per core). position is a FEN string or a Position
+    pos = Position.from_fen(position) if isinstance(position, str) else position.copy()
+    fen = pos.to_fen()
+    history = tuple(history)
+    moves = bb.legal_moves(pos)
+    if not moves:
+        return None, -MATE if bb.in_check(pos, pos.colour) else 0, [], 0
+    alpha = multiprocessing.Value('q', -INFINITY, lock=False)  # one int read and written whole, so no lock is needed
+    ordering = Search(table=TranspositionTable(0))  # only orders the root moves, by the last best move and captures
+    best_move, best_score, pv, nodes = moves[0], 0, [], 0
+    with ProcessPoolExecutor(workers or os.cpu_count(), initializer=init_worker,
+                             initargs=(alpha, table_mb)) as pool:
+        for current_depth in range(1, depth + 1):
+            ordered = ordering.order_moves(pos, moves[:], 0, True)
+            alpha.value = -INFINITY
+            first = pool.submit(search_move, fen, history, ordered[0], current_depth, -INFINITY, pv).result()
+            results = {first[0]: first}
+            alpha.value = first[1]
+            futures = [pool.submit(search_move, fen, history, move, current_depth, first[1], pv)
+                       for move in ordered[1:]]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result[0]] = result
+                if result[1] > alpha.value:
+                    alpha.value = result[1]
+
+            best = max((results[move] for move in ordered), key=lambda result: result[1])  # the earliest of equal ones
+            # a move before the best one that failed low against a bound at least the best score could be equal to it,
+            # and the earlier move is kept, so find out
+            for move in ordered[:ordered.index(best[0])]:
+                move, score, searched_alpha, _, _ = results[move]
+                if score <= searched_alpha and searched_alpha >= best[1]:
+                    alpha.value = -INFINITY
+                    result = pool.submit(search_move, fen, history, move, current_depth, best[1] - 1, pv).result()
+                    nodes += result[4]
+                    if result[1] >= best[1]:
+                        best = result
+                        break
+
+            nodes += sum(result[4] for result in results.values())
+            best_move, best_score, pv = best[0], best[1], best[3]
+            ordering.previous_pv = pv
+            if abs(best_score) > MATE_BOUND:
+                break
+    return best_move, best_score, pv, nodes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Root split parallel search compared with a single core search.')
+    parser.add_argument('fen', nargs='?', default=START_FEN)
+    parser.add_argument('-d', '--depth', type=int, default=5)
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    serial = Search(args.depth)
+    serial_move, serial_score = serial.iterative_deepening(Position.from_fen(args.fen))
+    serial_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    move, score, pv, nodes = parallel_search(args.fen, args.depth, args.workers)
+    parallel_time = time.perf_counter() - start_time
+
+    print('%-10s %6s %7s %10s %9s' % ('search', 'move', 'score', 'nodes', 'seconds'))
+    print('%-10s %6s %7d %10d %9.2f' % ('1 core', move_to_uci(serial_move), serial_score, serial.nodes, serial_time))
+    print('%-10s %6s %7d %10d %9.2f' % ('%d workers' % args.workers, move_to_uci(move), score, nodes, parallel_time))
+    print('speedup %.2f, same move: %s, pv %s' % (serial_time / parallel_time, 'yes' if move == serial_move else 'no',
+                                                   ' '.join(move_to_uci(pv_move) for pv_move in pv)))
+    return 0 if move == serial_move else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# Pawn structure: isolated, doubled, backward and passed pawns and pawn islands, worked out from the pawn bitboards.
+# The pawns only change on pawn moves and captures of pawns, so the result is cached in a pawn hash table keyed by
+# Position.pawn_key (a Zobrist key of the pawns alone) and most evaluations find it there.
+
+from array import array
+
+from bitboard import FULL, FILE_A, count, squares, north, south, pawn_attacks
+from position import PAWN, WHITE, BLACK
+
+# (midgame, endgame) centipawns
+DOUBLED = (10, 20)  # for each pawn on a file after the first
+ISOLATED = (10, 15)  # no pawns of the same colour on the files either side
+BACKWARD = (8, 10)  # every pawn on the files either side is further forward and the square in front is covered
+ISLAND = (5, 10)  # for each group of neighbouring files with pawns after the first
+# passed pawns (no enemy pawn in front on the same file or the files either side) by rank, counted from the pawn's side
+PASSED_MIDGAME = (0, 5, 10, 20, 35, 60, 100, 0)
+PASSED_ENDGAME = (0, 10, 20, 40, 70, 120, 200, 0)
+
+ENTRY_BYTES = 16  # key, midgame and endgame scores
+
+file_masks = [FILE_A << file for file in range(8)]
+adjacent_files = [(file_masks[file - 1] if file > 0 else 0) | (file_masks[file + 1] if file < 7 else 0)
+                  for file in range(8)]
+# passed_masks[colour][square]: squares in front of the pawn on its own file and the files either side
+passed_masks = [[0] * 64, [0] * 64]
+# support_masks[colour][square]: squares on the files either side that are level with or behind the pawn
+support_masks = [[0] * 64, [0] * 64]
+for square in range(64):
+    row, file = square >> 3, square & 7
+    above = (1 << 8 * row) - 1  # rows nearer rank 8
+    below = FULL ^ ((1 << 8 * (row + 1)) - 1)  # rows nearer rank 1
+    passed_masks[WHITE][square] = (file_masks[file] | adjacent_files[file]) & above
+    passed_masks[BLACK][square] = (file_masks[file] | adjacent_files[file]) & below
+    support_masks[WHITE][square] = adjacent_files[file] & ~above & FULL
+    support_masks[BLACK][square] = adjacent_files[file] & ~below & FULL
+front_files = [north, south]  # squares in front of a pawn on its own file
+
+
+def side_scores(own, enemy, colour):  # (midgame, endgame) for the pawns of one side, good for that side
+    midgame = endgame = 0
+    files = 0
+    for square in squares(own):
+        row, file = square >> 3, square & 7
+        files |= 1 << file
+        if not own & adjacent_files[file]:
+            midgame -= ISOLATED[0]
+            endgame -= ISOLATED[1]
+        elif not own & support_masks[colour][square]:
+            stop = square - 8 if colour == WHITE else square + 8
+            if pawn_attacks[colour][stop] & enemy:  # can't move up without being taken
+                midgame -= BACKWARD[0]
+                endgame -= BACKWARD[1]
+        if not enemy & passed_masks[colour][square] and not own & front_files[colour][square]:
+            rank = 7 - row if colour == WHITE else row
+            midgame += PASSED_MIDGAME[rank]
+            endgame += PASSED_ENDGAME[rank]
+    for file in range(8):
+        if files >> file & 1:
+            extra = count(own & file_masks[file]) - 1
+            midgame -= extra * DOUBLED[0]
+            endgame -= extra * DOUBLED[1]
+    islands = count(files & ~(files << 1))  # files with pawns that don't have pawns on the file to their left
+    if islands > 1:
+        midgame -= (islands - 1) * ISLAND[0]
+        endgame -= (islands - 1) * ISLAND[1]
+    return midgame, endgame
+
+
+def pawn_scores(pos):  # (midgame, endgame) from white's point of view, worked out from scratch
+    white, black = pos.pieces[PAWN], pos.pieces[PAWN | 8]
+    white_midgame, white_endgame = side_scores(white, black, WHITE)
+    black_midgame, black_endgame = side_scores(black, white, BLACK)
+    return white_midgame - black_midgame, white_endgame - black_endgame
+
+
+class PawnTable:
+    # One entry per index, always replaced. Empty entries have key 0, which is also the key with no pawns on the
+    # board, whose scores are 0 anyway
+    def __init__(self, size_mb=1):
+        self.size_mb = size_mb
+        self.entries = max(1, int(size_mb * 1024 * 1024) // ENTRY_BYTES)
+        self.keys = array('Q', bytes(8 * self.entries))
+        self.scores = array('i', bytes(8 * self.entries))  # midgame, endgame for each entry
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        self.keys = array('Q', bytes(8 * self.entries))
+        self.scores = array('i', bytes(8 * self.entries))
+        self.probes = self.hits = 0
+
+    def lookup(self, pos):  # (midgame, endgame) pawn scores from white's point of view
+        self.probes += 1
+        key = pos.pawn_key
+        index = key % self.entries
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.scores[2 * index], self.scores[2 * index + 1]
+        midgame, endgame = pawn_scores(pos)
+        self.keys[index] = key
+        self.scores[2 * index] = midgame
+        self.scores[2 * index + 1] = endgame
+        return midgame, endgame
+
+    def stats(self):
+        return {'size_mb': self.size_mb, 'probes': self.probes, 'hits': self.hits,
+                'hit_rate': self.hits / self.probes if self.probes else 0}
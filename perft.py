@@ -0,0 +1,172 @@
+# Perft counts the leaf nodes of the move tree to a fixed depth. The counts for the standard test positions are known,
+# so any difference is a move generation bug, and the time taken measures how fast a generator is.
+#
+#   python perft.py --suite                              standard positions against their known counts
+#   python perft.py "<fen>" -d 4 --divide                nodes under each root move
+#   python perft.py -d 3 --backend fen --backend bitboard    compare generators side by side
+#
+# The 'fen' backend is the string generator in rules.py, the one the GUI plays by.
+
+import argparse
+import sys
+import time
+
+import bitboard as bb
+import rules
+from position import (Position, START_FEN, PAWN, QUEEN, ROOK, BISHOP, KNIGHT, EMPTY, encode_move, move_to_uci,
+                      make_move, unmake_move, available_moves, update_position)
+
+# (name, FEN, node counts from depth 1 upwards)
+suite = [
+    ('start', START_FEN, [20, 400, 8902, 197281, 4865609, 119060324]),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     [48, 2039, 97862, 4085603, 193690690]),
+    ('position 3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', [14, 191, 2812, 43238, 674624, 11030083]),
+    ('position 4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     [6, 264, 9467, 422333, 15833292]),
+    ('position 5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', [44, 1486, 62379, 2103487, 89941194]),
+    ('position 6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     [46, 2079, 89890, 3894594, 164075551]),
+]
+
+
+def bitboard_perft(pos, depth):
+    moves = bb.legal_moves(pos)
+    if depth == 1:  # bulk count, the leaf moves don't need to be made
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        undo = make_move(pos, move)
+        nodes += bitboard_perft(pos, depth - 1)
+        unmake_move(pos, undo)
+    return nodes
+
+
+def bitboard_divide(fen, depth):
+    pos = Position.from_fen(fen)
+    result = {}
+    for move in bb.legal_moves(pos):
+        undo = make_move(pos, move)
+        result[move_to_uci(move)] = bitboard_perft(pos, depth - 1) if depth > 1 else 1
+        unmake_move(pos, undo)
+    return result
+
+
+def position_children(pos):  # (UCI move, position after it) using the array generators in position.py
+    children = []
+    for start in range(64):
+        piece = pos.board[start]
+        if piece == EMPTY or piece >> 3 != pos.colour:
+            continue
+        for row, col in available_moves(pos, start // 8, start % 8, True):
+            move = (divmod(start, 8), (row, col))
+            if piece & 7 == PAWN and row in (0, 7):
+                for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                    children.append((move_to_uci(encode_move(start, 8 * row + col, promotion)),
+                                     update_position(pos, move, promotion)))
+            else:
+                children.append((move_to_uci(encode_move(start, 8 * row + col)), update_position(pos, move)))
+    return children
+
+
+def position_perft(pos, depth):
+    children = position_children(pos)
+    if depth == 1:
+        return len(children)
+    return sum(position_perft(child, depth - 1) for _, child in children)
+
+
+def position_divide(fen, depth):
+    return {name: position_perft(child, depth - 1) if depth > 1 else 1
+            for name, child in position_children(Position.from_fen(fen))}
+
+
+def fen_children(fen):  # (UCI move, FEN after it) using the string functions in rules.py
+    children = []
+    colour = rules.find_colour(fen)[0]
+    grid = rules.fen_grid(fen)
+    for r in range(8):
+        for c in range(8):
+            piece = grid[r][c]
+            if piece == 'empty' or (piece.isupper() != (colour == 'w')):
+                continue
+            for square in rules.available_moves(r, c, fen, True):
+                name = move_to_uci(encode_move(8 * r + c, 8 * square[0] + square[1]))
+                if piece.lower() == 'p' and square[0] in (0, 7):  # promotes the way the GUI does
+                    for promotion in 'qrbn':
+                        promotion_fen = rules.update_promotion_fen(fen, (r, c), promotion.upper() if colour == 'w'
+                                                                   else promotion)
+                        children.append((name + promotion, rules.update_fen(promotion_fen, [(r, c), square])))
+                else:
+                    children.append((name, rules.update_fen(fen, [(r, c), square])))
+    return children
+
+
+def fen_perft(fen, depth):
+    children = fen_children(fen)
+    if depth == 1:
+        return len(children)
+    return sum(fen_perft(child, depth - 1) for _, child in children)
+
+
+def fen_divide(fen, depth):
+    return {name: fen_perft(child, depth - 1) if depth > 1 else 1 for name, child in fen_children(fen)}
+
+
+backends = {'bitboard': bitboard_divide, 'position': position_divide, 'fen': fen_divide}
+
+
+def run(fen, depth, backend):  # returns (nodes under each root move, total nodes, seconds)
+    start_time = time.perf_counter()
+    result = backends[backend](fen, depth)
+    return result, sum(result.values()), time.perf_counter() - start_time
+
+
+def print_divide(results):
+    names = list(results)
+    moves = sorted(set().union(*(results[name][0] for name in names)))
+    print('move    ' + ''.join('%12s' % name for name in names))
+    for move in moves:
+        counts = [results[name][0].get(move) for name in names]
+        marker = '' if len(set(counts)) == 1 else '   <- differs'
+        print('%-8s' % move + ''.join('%12s' % ('-' if count is None else count) for count in counts) + marker)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Count move generator leaf nodes to a fixed depth.')
+    parser.add_argument('fen', nargs='?', default=START_FEN)
+    parser.add_argument('-d', '--depth', type=int, default=3)
+    parser.add_argument('--backend', action='append', choices=sorted(backends),
+                        help='generator to test, can be given more than once (default bitboard)')
+    parser.add_argument('--divide', action='store_true', help='print the nodes under each root move')
+    parser.add_argument('--suite', action='store_true', help='run the standard positions against their known counts')
+    args = parser.parse_args(argv)
+    chosen = args.backend or ['bitboard']
+
+    if args.suite:
+        positions = [(name, fen, counts[:args.depth]) for name, fen, counts in suite]
+    else:
+        positions = [('position', args.fen, [])]
+
+    failed = False
+    print('%-12s %-9s %5s %12s %12s %9s %10s' % ('position', 'backend', 'depth', 'nodes', 'expected', 'seconds', 'nps'))
+    for name, fen, counts in positions:
+        depth = len(counts) if counts else args.depth
+        results = {}
+        for backend in chosen:
+            results[backend] = run(fen, depth, backend)
+            _, nodes, seconds = results[backend]
+            expected = counts[-1] if counts else ''
+            status = ''
+            if counts and nodes != expected:
+                status = ' FAIL'
+                failed = True
+            print('%-12s %-9s %5d %12d %12s %9.3f %10d%s' % (name, backend, depth, nodes, expected, seconds,
+                                                            nodes / seconds if seconds else 0, status))
+        if args.divide:
+            print_divide(results)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
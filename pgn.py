@@ -0,0 +1,329 @@
+# PGN (Portable Game Notation) reading and writing, with moves in SAN (standard algebraic notation, e.g. Nbd7, exd6,
+# e8=Q+, O-O-O#).
+#
+#   python pgn.py games.pgn                     replays every game and reports moves per second and any bad games
+#   python pgn.py games.pgn -o clean.pgn        also writes them back out in the standard export format
+#
+# Games are read one at a time from any iterable of lines, so a database of any size is walked with only the current
+# game in memory. SAN is turned into moves by looking only at the pieces of the right type that reach the square,
+# not by generating every move and writing each one in SAN, and the moves are made on a single Position, so no FEN
+# strings are built along the way.
+
+import argparse
+import re
+import sys
+import time
+
+import bitboard as bb
+from bitboard import knight_attacks, king_attacks, pawn_attacks, bishop_attacks, rook_attacks, squares
+from position import (Position, START_FEN, EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK,
+                      encode_move, make_move, unmake_move, square_name, parse_square)
+
+san_pieces = {'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING}
+piece_letters = {piece: letter for letter, piece in san_pieces.items()}
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+SEVEN_TAG_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')  # the tags every export starts with
+LINE_LENGTH = 79
+
+# piece, file and rank the move is from (either can be left out), capture, square moved to and promotion
+SAN = re.compile(r'([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?$')
+TAG = re.compile(r'\[\s*(\w+)\s+"(.*)"\s*\]$')  # to the last quote, since some writers don't escape quotes in values
+# a comment in braces, a rest of line comment, a NAG ($ and a number), a variation bracket, a move number, a result or
+# anything else, which should be a move
+TOKEN = re.compile(r'\{[^}]*\}|;[^\n]*|\$\d+|[()]|\d+\.+|1-0|0-1|1/2-1/2|\*|[^\s{};()$]+')
+
+
+class Game:
+    def __init__(self, headers=None, moves=None, result='*'):
+        self.headers = dict(headers or {})  # tag pairs in the order they were read
+        self.moves = list(moves or [])  # ints from position.encode_move, from the start position
+        self.result = result
+        self.error = None  # why the moves stop early, for a game with a move that couldn't be read
+
+    def start_fen(self):
+        return self.headers.get('FEN', START_FEN)
+
+    def positions(self):
+        # (position, move) before each move of the game. It is the same Position each time, with the move made once
+        # the caller is done with it, so copy it to keep it
+        pos = Position.from_fen(self.start_fen())
+        for move in self.moves:
+            yield pos, move
+            make_move(pos, move)
+
+    def end_position(self):
+        pos = Position.from_fen(self.start_fen())
+        for move in self.moves:
+            make_move(pos, move)
+        return pos
+
+    def __repr__(self):
+        return 'Game(%s vs %s, %d moves, %s)' % (self.headers.get('White', '?'), self.headers.get('Black', '?'),
+                                                  len(self.moves), self.result)
+
+
+def reaches(piece_type, colour, square, occupied):
+    # every square a piece of piece_type and colour could move to square from, as a bitboard. Pawns are only their
+    # captures, since pushes are worked out separately
+    if piece_type == PAWN:
+        return pawn_attacks[colour ^ 1][square]
+    if piece_type == KNIGHT:
+        return knight_attacks[square]
+    if piece_type == BISHOP:
+        return bishop_attacks(square, occupied)
+    if piece_type == ROOK:
+        return rook_attacks(square, occupied)
+    if piece_type == QUEEN:
+        return bishop_attacks(square, occupied) | rook_attacks(square, occupied)
+    return king_attacks[square]
+
+
+def check_suffix(pos, move):  # '#', '+' or '' for what the move does to the other king
+    undo = make_move(pos, move)
+    suffix = ''
+    if bb.in_check(pos, pos.colour):
+        suffix = '+' if bb.legal_moves(pos) else '#'
+    unmake_move(pos, undo)
+    return suffix
+
+
+def move_to_san(pos, move):
+    # SAN for a legal move in the position, e.g. 'Nbd7', 'exd6', 'e8=Q+' or 'O-O'
+    start, end, promotion = move & 63, move >> 6 & 63, move >> 12
+    piece_type = pos.board[start] & 7
+    if piece_type == KING and abs(end - start) == 2:
+        return ('O-O' if end > start else 'O-O-O') + check_suffix(pos, move)
+    capture = pos.board[end] != EMPTY or (piece_type == PAWN and end == pos.en_passant)
+    if piece_type == PAWN:
+        san = (square_name(start)[0] + 'x' if capture else '') + square_name(end)
+        if promotion:
+            san += '=' + piece_letters[promotion]
+        return san + check_suffix(pos, move)
+
+    # another piece of the same kind that can legally go to the same square means saying which one is moving: by
+    # file if that tells them apart, otherwise by rank, otherwise both
+    occupied = pos.occupied[WHITE] | pos.occupied[BLACK]
+    others = [other for other in squares(reaches(piece_type, pos.colour, end, occupied)
+                                         & pos.pieces[pos.board[start]] & ~(1 << start))
+              if not bb.leaves_king_in_check(pos, encode_move(other, end))]
+    san = piece_letters[piece_type]
+    if others:
+        if all(other % 8 != start % 8 for other in others):
+            san += square_name(start)[0]
+        elif all(other // 8 != start // 8 for other in others):
+            san += square_name(start)[1]
+        else:
+            san += square_name(start)
+    return san + ('x' if capture else '') + square_name(end) + check_suffix(pos, move)
+
+
+def move_from_san(pos, san):
+    # The move a SAN string stands for in the position. Check and annotation marks are ignored. Raises ValueError if
+    # it isn't a legal move or could be more than one
+    text = san.rstrip('+#!?')
+    colour = pos.colour
+    king = pos.pieces[KING | colour << 3].bit_length() - 1
+    if text in ('O-O', 'O-O-O', '0-0', '0-0-0'):
+        end = king + 2 if len(text) == 3 else king - 2
+        move = encode_move(king, end)
+        if move not in bb.castling_moves(pos, king, pos.occupied[WHITE] | pos.occupied[BLACK]):
+            raise ValueError('illegal move %r' % san)
+        return move
+
+    match = SAN.match(text)
+    if match is None:
+        raise ValueError('unreadable move %r' % san)
+    letter, from_file, from_rank, capture, end_name, promotion_letter = match.groups()
+    piece_type = san_pieces[letter] if letter else PAWN
+    end = parse_square(end_name)
+    promotion = san_pieces[promotion_letter] if promotion_letter else EMPTY
+    occupied = pos.occupied[WHITE] | pos.occupied[BLACK]
+    target = pos.board[end]
+    if target != EMPTY and target >> 3 == colour:
+        raise ValueError('illegal move %r' % san)
+
+    if piece_type == PAWN and not capture:
+        # a push comes from one square behind, or two from the starting row
+        step = 8 if colour == WHITE else -8
+        if target != EMPTY or not 0 <= end + step < 64:  # nothing can be pushed to its own back row
+            raise ValueError('illegal move %r' % san)
+        if pos.board[end + step] == EMPTY and end // 8 == (4 if colour == WHITE else 3):
+            candidates = 1 << end + 2 * step
+        else:
+            candidates = 1 << end + step
+        candidates &= pos.pieces[PAWN | colour << 3]
+    else:
+        if piece_type == PAWN and target == EMPTY and end != pos.en_passant:
+            raise ValueError('illegal move %r' % san)
+        candidates = reaches(piece_type, colour, end, occupied) & pos.pieces[piece_type | colour << 3]
+    if piece_type == PAWN and (end < 8 or end >= 56) != bool(promotion):
+        raise ValueError('illegal move %r' % san)
+
+    moves = [encode_move(start, end, promotion) for start in squares(candidates)
+             if (from_file is None or square_name(start)[0] == from_file)
+             and (from_rank is None or square_name(start)[1] == from_rank)]
+    moves = [move for move in moves if not bb.leaves_king_in_check(pos, move)]
+    if len(moves) != 1:
+        raise ValueError('%s move %r' % ('ambiguous' if moves else 'illegal', san))
+    return moves[0]
+
+
+def game_from_sans(headers, sans, result='*'):
+    # A Game from the SAN moves of its main line. Reading stops at the first move that can't be read, with the reason
+    # kept in the game's error
+    game = Game(headers, result=result)
+    try:
+        pos = Position.from_fen(game.start_fen())
+    except (ValueError, IndexError, KeyError):
+        game.error = 'invalid FEN tag %r' % game.start_fen()
+        return game
+    for san in sans:
+        try:
+            move = move_from_san(pos, san)
+        except (ValueError, KeyError) as error:
+            game.error = '%s at ply %d' % (error, len(game.moves) + 1)
+            break
+        game.moves.append(move)
+        make_move(pos, move)
+    return game
+
+
+def movetext_sans(text):
+    # (SAN moves of the main line, result) from the movetext of a game, leaving out comments, NAGs, move numbers and
+    # variations
+    sans = []
+    result = '*'
+    depth = 0  # how many variations deep
+    for token in TOKEN.findall(text):
+        first = token[0]
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth = max(0, depth - 1)
+        elif depth or first in '{;$' or first.isdigit() and token[-1] == '.':
+            continue
+        elif token in RESULTS:
+            result = token
+        else:
+            sans.append(token)
+    return sans, result
+
+
+def read_games(lines):
+    # Yields each game in lines, any iterable of lines of PGN such as an open file, as it is read
+    headers = {}
+    movetext = []
+    in_comment = False  # a comment in braces can go over several lines and have a [ at the start of one
+    for line in lines:
+        stripped = line.strip()
+        if not in_comment and stripped.startswith('['):
+            if movetext:  # a tag after movetext starts the next game
+                sans, result = movetext_sans('\n'.join(movetext))
+                yield game_from_sans(headers, sans, result)
+                headers, movetext = {}, []
+            match = TAG.match(stripped)
+            if match is not None:
+                name, value = match.groups()
+                headers[name] = value.replace('\\"', '"').replace('\\\\', '\\')
+        elif stripped and not stripped.startswith('%'):  # % at the start of a line escapes it
+            movetext.append(stripped)
+            if in_comment:
+                in_comment = '}' not in stripped or stripped.rfind('{') > stripped.rfind('}')
+            else:
+                in_comment = stripped.rfind('{') > stripped.rfind('}')
+    if headers or movetext:
+        sans, result = movetext_sans('\n'.join(movetext))
+        yield game_from_sans(headers, sans, result)
+
+
+def game_to_pgn(game):
+    # The game in the PGN export format: the seven tag roster first, then the other tags, then the moves in SAN
+    # wrapped to LINE_LENGTH, ending with the result
+    headers = dict(game.headers)
+    headers['Result'] = game.result
+    tags = list(SEVEN_TAG_ROSTER) + [name for name in headers if name not in SEVEN_TAG_ROSTER]
+    unknown = {'Date': '????.??.??'}  # what a missing tag is written as, '?' unless it is here
+    lines = ['[%s "%s"]' % (name, headers.get(name, unknown.get(name, '?')).replace('\\', '\\\\').replace('"', '\\"'))
+             for name in tags]
+    lines.append('')
+
+    tokens = []
+    pos = Position.from_fen(game.start_fen())
+    for ply, move in enumerate(game.moves):
+        if pos.colour == WHITE:
+            tokens.append('%d.' % pos.fullmove)
+        elif ply == 0:
+            tokens.append('%d...' % pos.fullmove)
+        tokens.append(move_to_san(pos, move))
+        make_move(pos, move)
+    tokens.append(game.result)
+
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_LENGTH:
+            lines.append(line)
+            line = token
+        else:
+            line = line + ' ' + token if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+def write_games(games, output):  # output is anything with a write method, e.g. an open file
+    for game in games:
+        output.write(game_to_pgn(game) + '\n')
+
+
+def game_from_fens(fens, headers=None, result='*'):
+    # A Game from a list of FENs, one after each move, such as the GUI's fen_list. The move between two FENs is the
+    # legal move that gives the same pieces on the same squares
+    game = Game(headers, result=result)
+    if fens and fens[0].split(' ')[0] != START_FEN.split(' ')[0]:
+        game.headers['SetUp'] = '1'
+        game.headers['FEN'] = fens[0]
+    pos = Position.from_fen(fens[0]) if fens else None
+    for fen in fens[1:]:
+        placement = fen.split(' ')[0]
+        for move in bb.legal_moves(pos):
+            undo = make_move(pos, move)
+            if pos.to_fen().split(' ')[0] == placement:
+                game.moves.append(move)
+                break
+            unmake_move(pos, undo)
+        else:
+            raise ValueError('no legal move leads to %r' % fen)
+    return game
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay the games in a PGN file, optionally writing them back out.')
+    parser.add_argument('input', help="PGN file, or '-' for stdin")
+    parser.add_argument('-o', '--output', help='file to write the games to in the PGN export format')
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8', errors='replace')
+    output = open(args.output, 'w') if args.output else None
+    games = plies = bad = 0
+    start_time = time.perf_counter()
+    try:
+        for game in read_games(source):
+            games += 1
+            plies += len(game.moves)
+            if game.error is not None:
+                bad += 1
+                print('game %d (%r): %s' % (games, game, game.error), file=sys.stderr)
+            if output is not None:
+                write_games([game], output)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not None:
+            output.close()
+    seconds = time.perf_counter() - start_time
+    print('%d games, %d plies in %.2f seconds, %.0f plies per second, %d with a bad move'
+          % (games, plies, seconds, plies / seconds if seconds else 0, bad))
+    return 0 if bad == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,416 @@
+# Array based board representation. Every square is an index 8 * row + col where (0, 0) is the top left square (a8),
+# the same (row, col) convention as board.py so squares and moves convert directly between the two.
+# Looking up a square is a single index into a bytearray instead of walking the FEN string.
+
+from psqt import midgame_scores, endgame_scores, piece_phase
+from zobrist import piece_keys, pawn_keys, black_to_move_key, castling_keys, en_passant_keys, compute_key
+
+EMPTY = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+WHITE, BLACK = 0, 1
+# a piece is its type with the colour in bit 3, e.g. a black knight is KNIGHT | 8. piece >> 3 gives the colour
+
+char_to_piece = {'P': PAWN, 'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING,
+                 'p': PAWN | 8, 'n': KNIGHT | 8, 'b': BISHOP | 8, 'r': ROOK | 8, 'q': QUEEN | 8, 'k': KING | 8}
+piece_to_char = {piece: char for char, piece in char_to_piece.items()}
+
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+castling_chars = (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE), ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE))
+
+alpha_to_index = {'a': 0, 'b': 1, 'c': 2, 'd': 3, 'e': 4, 'f': 5, 'g': 6, 'h': 7}
+index_to_alpha = {0: 'a', 1: 'b', 2: 'c', 3: 'd', 4: 'e', 5: 'f', 6: 'g', 7: 'h'}
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+# Moves used by the faster generators are packed into an int: start square, end square and the promotion piece type
+# (EMPTY if the move isn't a promotion)
+def encode_move(start, end, promotion=EMPTY):
+    return start | end << 6 | promotion << 12
+
+
+def decode_move(move):
+    return move & 63, move >> 6 & 63, move >> 12
+
+
+def move_to_squares(move):  # int move -> [(row, col), (row, col)] as used by board.py
+    return [divmod(move & 63, 8), divmod(move >> 6 & 63, 8)]
+
+
+def move_to_uci(move):  # e.g. 'e2e4' or 'e7e8q'
+    promotion = move >> 12
+    return square_name(move & 63) + square_name(move >> 6 & 63) + (piece_to_char[promotion | 8] if promotion else '')
+
+
+def move_from_uci(text):
+    promotion = char_to_piece[text[4].lower()] & 7 if len(text) > 4 else EMPTY
+    return encode_move(parse_square(text[:2]), parse_square(text[2:4]), promotion)
+
+
+def square_name(square):  # 36 -> 'e4'
+    return index_to_alpha[square % 8] + str(8 - square // 8)
+
+
+def parse_square(name):  # 'e4' -> 36
+    return 8 * (8 - int(name[1])) + alpha_to_index[name[0]]
+
+
+class Position:
+    __slots__ = ('board', 'pieces', 'occupied', 'colour', 'castling', 'en_passant', 'halfmove', 'fullmove', 'key',
+                 'pawn_key', 'midgame', 'endgame', 'phase')
+
+    def __init__(self):
+        self.board = bytearray(64)  # piece codes, EMPTY for an empty square
+        # bitboards kept in step with the board: bit n is square n. pieces is indexed by piece code
+        self.pieces = [0] * 16
+        self.occupied = [0, 0]  # all the white pieces, all the black pieces
+        self.colour = WHITE  # side to move
+        self.castling = 0  # bitmask of WHITE_KINGSIDE etc.
+        self.en_passant = None  # square a pawn can capture onto en passant
+        self.halfmove = 0
+        self.fullmove = 1
+        self.key = 0  # Zobrist key, see zobrist.py
+        self.pawn_key = 0
+        # material and piece-square sums from white's point of view, and the game phase, see psqt.py
+        self.midgame = 0
+        self.endgame = 0
+        self.phase = 0
+
+    @classmethod
+    def from_fen(cls, fen):
+        pos = cls()
+        fields = fen.split(' ')  # not split() since rules.update_fen can leave an empty castling field
+        row, col = 0, 0
+        for char in fields[0]:
+            if char == '/':
+                row += 1
+                col = 0
+            elif char.isdigit():
+                col += int(char)
+            else:
+                pos.put_piece(8 * row + col, char_to_piece[char])
+                col += 1
+        pos.colour = WHITE if fields[1] == 'w' else BLACK
+        for char, right in castling_chars:
+            if char in fields[2]:
+                pos.castling |= right
+        if fields[3] != '-':
+            pos.en_passant = parse_square(fields[3])
+        if len(fields) > 5:
+            pos.halfmove = int(fields[4])
+            pos.fullmove = int(fields[5])
+        pos.key = compute_key(pos)
+        return pos
+
+    def to_fen(self):
+        rows = []
+        for row in range(8):
+            fen_row = ''
+            empty = 0
+            for piece in self.board[8 * row:8 * row + 8]:
+                if piece == EMPTY:
+                    empty += 1
+                else:
+                    if empty:
+                        fen_row += str(empty)
+                        empty = 0
+                    fen_row += piece_to_char[piece]
+            if empty:
+                fen_row += str(empty)
+            rows.append(fen_row)
+        castling = ''.join(char for char, right in castling_chars if self.castling & right) or '-'
+        en_passant = square_name(self.en_passant) if self.en_passant is not None else '-'
+        return ' '.join(('/'.join(rows), 'wb'[self.colour], castling, en_passant, str(self.halfmove),
+                         str(self.fullmove)))
+
+    def copy(self):
+        pos = Position.__new__(Position)
+        pos.board = self.board[:]
+        pos.pieces = self.pieces[:]
+        pos.occupied = self.occupied[:]
+        pos.colour = self.colour
+        pos.castling = self.castling
+        pos.en_passant = self.en_passant
+        pos.halfmove = self.halfmove
+        pos.fullmove = self.fullmove
+        pos.key = self.key
+        pos.pawn_key = self.pawn_key
+        pos.midgame = self.midgame
+        pos.endgame = self.endgame
+        pos.phase = self.phase
+        return pos
+
+    def piece_on_square(self, row, col):
+        return self.board[8 * row + col]
+
+    def put_piece(self, square, piece):
+        self.board[square] = piece
+        bit = 1 << square
+        self.pieces[piece] |= bit
+        self.occupied[piece >> 3] |= bit
+        self.key ^= piece_keys[piece][square]
+        self.pawn_key ^= pawn_keys[piece][square]
+        self.midgame += midgame_scores[piece][square]
+        self.endgame += endgame_scores[piece][square]
+        self.phase += piece_phase[piece]
+
+    def remove_piece(self, square):
+        piece = self.board[square]
+        self.board[square] = EMPTY
+        bit = 1 << square
+        self.pieces[piece] ^= bit
+        self.occupied[piece >> 3] ^= bit
+        self.key ^= piece_keys[piece][square]
+        self.pawn_key ^= pawn_keys[piece][square]
+        self.midgame -= midgame_scores[piece][square]
+        self.endgame -= endgame_scores[piece][square]
+        self.phase -= piece_phase[piece]
+        return piece
+
+    def __eq__(self, other):
+        return isinstance(other, Position) and all(getattr(self, slot) == getattr(other, slot)
+                                                   for slot in Position.__slots__)
+
+    def __repr__(self):
+        return 'Position(%r)' % self.to_fen()
+
+
+# Equivalents of the move generators in rules.py. They take a Position instead of a FEN string and return the same
+# lists of (row, col) destination squares, except that squares off the board are never returned.
+
+knight_offsets = ((1, 2), (-1, 2), (1, -2), (-1, -2), (2, 1), (-2, 1), (2, -1), (-2, -1))
+king_offsets = ((-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0))
+rook_directions = ((0, 1), (0, -1), (-1, 0), (1, 0))
+bishop_directions = ((-1, 1), (1, 1), (1, -1), (-1, -1))
+
+
+def sliding_moves(pos, row, col, directions):
+    a = []
+    board = pos.board
+    colour = board[8 * row + col] >> 3
+    for dr, dc in directions:
+        r, c = row + dr, col + dc
+        while 0 <= r < 8 and 0 <= c < 8:
+            target = board[8 * r + c]
+            if target == EMPTY:
+                a.append((r, c))
+            else:
+                if target >> 3 != colour:  # capture
+                    a.append((r, c))
+                break
+            r, c = r + dr, c + dc
+    return a
+
+
+def stepping_moves(pos, row, col, offsets):
+    a = []
+    board = pos.board
+    colour = board[8 * row + col] >> 3
+    for dr, dc in offsets:
+        r, c = row + dr, col + dc
+        if 0 <= r < 8 and 0 <= c < 8:
+            target = board[8 * r + c]
+            if target == EMPTY or target >> 3 != colour:
+                a.append((r, c))
+    return a
+
+
+def available_rook_moves(pos, row, col):
+    return sliding_moves(pos, row, col, rook_directions)
+
+
+def available_bishop_moves(pos, row, col):
+    return sliding_moves(pos, row, col, bishop_directions)
+
+
+def available_queen_moves(pos, row, col):
+    return sliding_moves(pos, row, col, rook_directions + bishop_directions)
+
+
+def available_knight_moves(pos, row, col):
+    return stepping_moves(pos, row, col, knight_offsets)
+
+
+def available_king_moves(pos, row, col):
+    a = stepping_moves(pos, row, col, king_offsets)
+    board = pos.board
+    colour = board[8 * row + col] >> 3
+    enemy_colour = colour ^ 1
+    home_row = 7 if colour == WHITE else 0
+    if (row, col) != (home_row, 4):
+        return a
+    kingside, queenside = (WHITE_KINGSIDE, WHITE_QUEENSIDE) if colour == WHITE else (BLACK_KINGSIDE, BLACK_QUEENSIDE)
+    s = 8 * home_row  # index of the first square on the home row
+    # the king can't castle out of, through or into check
+    if pos.castling & kingside and board[s + 5] == EMPTY and board[s + 6] == EMPTY \
+            and not any(square_attacked(pos, (home_row, c), enemy_colour) for c in (4, 5, 6)):
+        a.append((home_row, 6))
+    if pos.castling & queenside and board[s + 3] == EMPTY and board[s + 2] == EMPTY and board[s + 1] == EMPTY \
+            and not any(square_attacked(pos, (home_row, c), enemy_colour) for c in (4, 3, 2)):
+        a.append((home_row, 2))
+    return a
+
+
+def available_pawn_moves(pos, row, col):
+    a = []
+    board = pos.board
+    colour = board[8 * row + col] >> 3
+    direction = -1 if colour == WHITE else 1  # white pawns move up the board (towards row 0)
+    start_row = 6 if colour == WHITE else 1
+    r = row + direction
+    if not 0 <= r < 8:
+        return a
+    if board[8 * r + col] == EMPTY:
+        a.append((r, col))
+        if row == start_row and board[8 * (r + direction) + col] == EMPTY:
+            a.append((r + direction, col))
+    for c in (col - 1, col + 1):
+        if 0 <= c < 8:
+            target = board[8 * r + c]
+            if (target != EMPTY and target >> 3 != colour) or pos.en_passant == 8 * r + c:
+                a.append((r, c))
+    return a
+
+
+move_functions = {PAWN: available_pawn_moves, KNIGHT: available_knight_moves, BISHOP: available_bishop_moves,
+                  ROOK: available_rook_moves, QUEEN: available_queen_moves, KING: available_king_moves}
+
+
+def available_moves(pos, row, col, check_check):
+    piece = pos.board[8 * row + col]
+    if piece == EMPTY:
+        return []
+    a = move_functions[piece & 7](pos, row, col)
+    if check_check:  # removes moves which leave the king in check
+        colour = piece >> 3
+        a = [square for square in a if not in_check(update_position(pos, ((row, col), square)), colour)]
+    return a
+
+
+def valid_move(player_clicks, pos):
+    (row, col), end_square = player_clicks
+    piece = pos.board[8 * row + col]
+    return piece != EMPTY and piece >> 3 == pos.colour and end_square in available_moves(pos, row, col, True)
+
+
+def square_attacked(pos, square, enemy_colour):
+    # Looks outward from the square for an enemy piece that attacks it (knight and king jumps, pawn diagonals, rays up
+    # to the first piece in the way) instead of generating the enemy moves. Stops at the first attacker
+    board = pos.board
+    row, col = square
+    e = enemy_colour << 3
+    pawn_direction = 1 if enemy_colour == WHITE else -1  # white pawns attack upwards so they sit below the square
+    for offsets, attacker in ((knight_offsets, KNIGHT | e), (king_offsets, KING | e),
+                              (((pawn_direction, -1), (pawn_direction, 1)), PAWN | e)):
+        for dr, dc in offsets:
+            r, c = row + dr, col + dc
+            if 0 <= r < 8 and 0 <= c < 8 and board[8 * r + c] == attacker:
+                return True
+    for directions, slider in ((rook_directions, ROOK | e), (bishop_directions, BISHOP | e)):
+        for dr, dc in directions:
+            r, c = row + dr, col + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                piece = board[8 * r + c]
+                if piece != EMPTY:
+                    if piece == slider or piece == QUEEN | e:
+                        return True
+                    break
+                r, c = r + dr, c + dc
+    return False
+
+
+def locate_king(pos, colour):
+    index = pos.board.find(KING | colour << 3)
+    if index == -1:
+        return ()
+    return index // 8, index % 8
+
+
+def in_check(pos, colour):
+    king = locate_king(pos, colour)
+    return king != () and square_attacked(pos, king, colour ^ 1)
+
+
+def update_position(pos, move, promotion_piece=QUEEN):
+    # Equivalent of rules.update_fen: returns the position after the move. Unlike rules.py this also takes away the
+    # castling rights of a rook captured on its starting square and promotes pawns that reach the last row
+    (row_1, col_1), (row_2, col_2) = move
+    start, end = 8 * row_1 + col_1, 8 * row_2 + col_2
+    promotion = promotion_piece if pos.board[start] & 7 == PAWN and row_2 in (0, 7) else EMPTY
+    new_pos = pos.copy()
+    make_move(new_pos, encode_move(start, end, promotion))
+    return new_pos
+
+
+def make_move(pos, move):
+    # Makes an int move on the position in place. Returns what unmake_move needs to put the position back exactly
+    start, end, promotion = move & 63, move >> 6 & 63, move >> 12
+    board = pos.board
+    piece = board[start]
+    captured = board[end]
+    undo = (move, captured, pos.castling, pos.en_passant, pos.halfmove, pos.key)
+    colour = piece >> 3
+    piece_type = piece & 7
+
+    pos.remove_piece(start)
+    if captured != EMPTY:
+        pos.remove_piece(end)
+    pos.put_piece(end, promotion | colour << 3 if promotion else piece)
+    if pos.en_passant is not None:
+        pos.key ^= en_passant_keys[pos.en_passant & 7]
+    if piece_type == PAWN:
+        if end == pos.en_passant:  # en passant capture removes the pawn behind the square moved to
+            pos.remove_piece(end + 8 if colour == WHITE else end - 8)
+        pos.en_passant = (start + end) // 2 if abs(end - start) == 16 else None
+        pos.halfmove = 0
+    else:
+        if piece_type == KING and abs(end - start) == 2:  # castling also moves the rook
+            rook, new_rook = (end + 1, end - 1) if end > start else (end - 2, end + 1)
+            pos.put_piece(new_rook, pos.remove_piece(rook))
+        pos.en_passant = None
+        pos.halfmove = 0 if captured != EMPTY else pos.halfmove + 1
+
+    if pos.en_passant is not None:
+        pos.key ^= en_passant_keys[pos.en_passant & 7]
+    castling = pos.castling & ~(castling_lost[start] | castling_lost[end])
+    pos.key ^= castling_keys[pos.castling] ^ castling_keys[castling] ^ black_to_move_key
+    pos.castling = castling
+    if colour == BLACK:
+        pos.fullmove += 1
+    pos.colour = colour ^ 1
+    return undo
+
+
+def unmake_move(pos, undo):
+    move, captured, castling, en_passant, halfmove, key = undo
+    start, end, promotion = move & 63, move >> 6 & 63, move >> 12
+    colour = pos.colour ^ 1  # the side that made the move
+    piece = pos.remove_piece(end)
+    if promotion:
+        piece = PAWN | colour << 3
+    pos.put_piece(start, piece)
+    if captured != EMPTY:
+        pos.put_piece(end, captured)
+    elif piece & 7 == PAWN and end == en_passant:
+        pos.put_piece(end + 8 if colour == WHITE else end - 8, PAWN | (colour ^ 1) << 3)
+    elif piece & 7 == KING and abs(end - start) == 2:
+        rook, new_rook = (end + 1, end - 1) if end > start else (end - 2, end + 1)
+        pos.put_piece(rook, pos.remove_piece(new_rook))
+
+    pos.castling = castling
+    pos.en_passant = en_passant
+    pos.halfmove = halfmove
+    pos.key = key
+    if colour == BLACK:
+        pos.fullmove -= 1
+    pos.colour = colour
+
+
+# castling rights lost when a piece moves from or to a square (kings and rooks leaving, rooks being captured)
+castling_lost = [0] * 64
+castling_lost[60] = WHITE_KINGSIDE | WHITE_QUEENSIDE
+castling_lost[63] = WHITE_KINGSIDE
+castling_lost[56] = WHITE_QUEENSIDE
+castling_lost[4] = BLACK_KINGSIDE | BLACK_QUEENSIDE
+castling_lost[7] = BLACK_KINGSIDE
+castling_lost[0] = BLACK_QUEENSIDE
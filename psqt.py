@@ -0,0 +1,162 @@
+# Material and piece-square tables. Every (piece, square) has a midgame and an endgame score: the piece's value plus a
+# bonus for the square, positive for white pieces and negative for black ones. Position keeps the sums of both, and
+# the game phase, up to date as pieces are put on and taken off squares (like the Zobrist key), so evaluating a leaf
+# is just blending the two sums by how much material is left.
+#
+#   python psqt.py --games 200       plays random games checking the kept sums against compute_scores
+#
+# The tables are written from white's point of view with rank 8 at the top, so the index is the square for white
+# pieces and square ^ 56 (the same file, the other side of the board) for black ones.
+
+piece_values = [0, 100, 300, 320, 500, 900, 0]  # centipawns indexed by piece type. Kings aren't counted
+phase_weights = [0, 0, 1, 1, 2, 4, 0]  # how much each piece type counts towards the game still being a midgame
+MAX_PHASE = 24  # all the pieces on the board. More is possible after promotions, so the phase is capped at this
+
+pawn_midgame = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0]
+pawn_endgame = [  # passed and advanced pawns are worth more as the board empties
+    0, 0, 0, 0, 0, 0, 0, 0,
+    80, 80, 80, 80, 80, 80, 80, 80,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    20, 20, 20, 20, 20, 20, 20, 20,
+    10, 10, 10, 10, 10, 10, 10, 10,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0]
+knight_table = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50]
+bishop_table = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20]
+rook_table = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0]
+queen_table = [
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20]
+king_midgame = [  # stay castled behind the pawns
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20]
+king_endgame = [  # come to the centre
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50]
+
+# indexed by piece type
+midgame_tables = [None, pawn_midgame, knight_table, bishop_table, rook_table, queen_table, king_midgame]
+endgame_tables = [None, pawn_endgame, knight_table, bishop_table, rook_table, queen_table, king_endgame]
+
+# indexed by piece code then square, with the sign for the piece's colour
+midgame_scores = [[0] * 64 for _ in range(16)]
+endgame_scores = [[0] * 64 for _ in range(16)]
+piece_phase = [0] * 16
+for piece_type in range(1, 7):
+    for square in range(64):
+        midgame_scores[piece_type][square] = piece_values[piece_type] + midgame_tables[piece_type][square]
+        endgame_scores[piece_type][square] = piece_values[piece_type] + endgame_tables[piece_type][square]
+        midgame_scores[piece_type | 8][square ^ 56] = -midgame_scores[piece_type][square]
+        endgame_scores[piece_type | 8][square ^ 56] = -endgame_scores[piece_type][square]
+    piece_phase[piece_type] = piece_phase[piece_type | 8] = phase_weights[piece_type]
+
+
+def compute_scores(pos):  # (midgame, endgame, phase) added up from scratch
+    midgame = endgame = phase = 0
+    for square, piece in enumerate(pos.board):
+        if piece:
+            midgame += midgame_scores[piece][square]
+            endgame += endgame_scores[piece][square]
+            phase += piece_phase[piece]
+    return midgame, endgame, phase
+
+
+def check_incremental(games, plies, seed=0):
+    # Plays random games, comparing the sums (and the Zobrist keys) kept by make_move and unmake_move with a full
+    # recompute at every position. Returns the number of positions checked and a description of the first mismatch
+    import bitboard as bb
+    from position import Position, START_FEN, make_move, unmake_move
+    from zobrist import compute_key, compute_pawn_key
+    import random
+    generator = random.Random(seed)
+    checked = 0
+    for _ in range(games):
+        pos = Position.from_fen(START_FEN)
+        undos = []
+        for _ in range(plies):
+            moves = bb.legal_moves(pos)
+            if not moves:
+                break
+            undos.append(make_move(pos, generator.choice(moves)))
+            checked += 1
+            if (pos.midgame, pos.endgame, pos.phase) != compute_scores(pos) or pos.key != compute_key(pos) \
+                    or pos.pawn_key != compute_pawn_key(pos):
+                return checked, 'after making a move: ' + pos.to_fen()
+        while undos:  # unmaking has to get back to the same sums too
+            unmake_move(pos, undos.pop())
+            checked += 1
+            if (pos.midgame, pos.endgame, pos.phase) != compute_scores(pos) or pos.key != compute_key(pos) \
+                    or pos.pawn_key != compute_pawn_key(pos):
+                return checked, 'after unmaking a move: ' + pos.to_fen()
+    return checked, None
+
+
+def main(argv=None):
+    import argparse  # only the command line needs these, not every process that imports the tables
+    parser = argparse.ArgumentParser(description='Check the incrementally kept evaluation sums against a recompute.')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--plies', type=int, default=200, help='longest game to play')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    checked, mismatch = check_incremental(args.games, args.plies, args.seed)
+    if mismatch:
+        print('mismatch %s' % mismatch)
+        return 1
+    print('%d positions checked, all match' % checked)
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
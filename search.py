@@ -0,0 +1,348 @@
+# Depth-first negamax search with alpha-beta pruning. Moves are made and unmade on a single Position and children are
+# only generated when their parent is searched, so no tree is kept and memory grows with the depth instead of b^d.
+# Scores are centipawns from the point of view of the side to move.
+#
+# Search.iterative_deepening searches depth 1, 2, 3... until a depth, time or node limit is reached, and always
+# answers with the best move of the last depth it finished. Each depth searches the previous principal variation first.
+# Results are kept in a transposition table so positions reached by different move orders are only searched once.
+#
+# Alpha-beta prunes most when the best move is searched first, so moves are ordered: the PV or hash move, then captures
+# by most valuable victim / least valuable attacker, then the killer moves (quiet moves that caused a cutoff at the same
+# ply), then the other quiet moves by their history score. Captures that static exchange evaluation says lose material
+# go after the killers.
+#
+# At depth 0 a quiescence search plays out captures and promotions, so a leaf isn't scored half way through an
+# exchange.
+
+import time
+
+import bitboard as bb
+import evaluation as ev
+from position import Position, EMPTY, PAWN, QUEEN, BLACK, make_move, unmake_move
+from psqt import piece_values
+from see import see
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+MATE = 100000  # being checkmated scores -MATE + ply so that quicker mates are preferred
+MATE_BOUND = MATE - 1000  # scores beyond this are mates
+INFINITY = 1000000
+MAX_PLY = 64
+FIRST_SCORE = 1 << 30  # ordering scores, highest first
+CAPTURE_SCORE = 1 << 28
+KILLER_SCORES = (1 << 27, (1 << 27) - 1)
+BAD_CAPTURE_SCORE = (1 << 27) - 256
+HISTORY_LIMIT = 1 << 26  # history scores are halved when one gets this big so they stay below the killers
+DELTA_MARGIN = 200  # a capture that can't lift the score to within this of alpha isn't searched in quiescence
+
+
+def is_quiet(pos, move):  # not a capture, en passant or promotion
+    end = move >> 6 & 63
+    return pos.board[end] == EMPTY and not move >> 12 \
+        and not (end == pos.en_passant and pos.board[move & 63] & 7 == PAWN)
+
+
+def capture_gain(pos, move):  # material won by a capture or promotion, before any recapture
+    end = move >> 6 & 63
+    victim = pos.board[end]
+    if victim == EMPTY and end == pos.en_passant and pos.board[move & 63] & 7 == PAWN:
+        victim = PAWN
+    gain = piece_values[victim & 7]
+    if move >> 12:
+        gain += piece_values[move >> 12] - piece_values[PAWN]
+    return gain
+
+
+def score_to_table(score, ply):
+    # mate scores count plies from the root, but a table entry can be reached at any ply so it stores them counted
+    # from the position itself
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class Search:
+    def __init__(self, depth=None, movetime=None, nodes=None, history=(), table=None, report=None):
+        # any of the limits can be None. With none of them the search runs until stopped is set (e.g. by another
+        # thread) or it reaches MAX_PLY. history is the Zobrist keys of the earlier positions in the game. Pass a
+        # TranspositionTable to keep what is learnt between searches. report is called with (depth, score, principal
+        # variation, nodes, seconds) each time a depth is finished
+        self.max_depth = min(depth or MAX_PLY, MAX_PLY)
+        self.movetime = movetime  # seconds
+        self.max_nodes = nodes
+        self.nodes = 0
+        self.stopped = False
+        self.deadline = None
+        self.pv = [[] for _ in range(MAX_PLY + 1)]  # pv[ply] is the best line found from ply onwards
+        self.previous_pv = []  # principal variation of the last finished depth
+        self.depth = 0  # depth being searched
+        self.start_time = 0
+        self.keys = list(history)  # keys of the game so far and then of the line being searched, for repetitions
+        self.table = table if table is not None else TranspositionTable()
+        self.killers = [[0, 0] for _ in range(MAX_PLY + 1)]
+        self.history = [[0] * 64 for _ in range(16)]  # indexed by piece then end square
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0  # cutoffs caused by the first move searched, to see how good the ordering is
+        self.quiescence_nodes = 0  # also counted in nodes
+        self.report = report
+
+    def check_limits(self):
+        if self.depth == 1:  # depth 1 always finishes so there is a move to play
+            return
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            self.stopped = True
+        elif self.deadline is not None and self.nodes & 1023 == 0 and time.perf_counter() >= self.deadline:
+            self.stopped = True
+
+    def is_repetition(self, pos):
+        # has the position (the last key) been seen since the last capture or pawn move? The same side has to be to
+        # move so only every other key is compared
+        keys = self.keys
+        last = len(keys) - 1
+        for i in range(last - 4, max(last - pos.halfmove, 0) - 1, -2):
+            if keys[i] == pos.key:
+                return True
+        return False
+
+    def order_moves(self, pos, moves, ply, on_pv, hash_move=0):
+        # while following the previous principal variation its move at this ply is searched first, otherwise the best
+        # move stored in the transposition table
+        if on_pv and ply < len(self.previous_pv):
+            first = self.previous_pv[ply]
+        else:
+            first = hash_move
+        board = pos.board
+        en_passant = pos.en_passant
+        killer_1, killer_2 = self.killers[ply]
+        history = self.history
+        scores = {}
+        for move in moves:
+            start, end = move & 63, move >> 6 & 63
+            victim = board[end]
+            if move == first:
+                scores[move] = FIRST_SCORE
+            elif victim != EMPTY or move >> 12:
+                # piece types go up in value from pawn to king, so this is most valuable victim, least valuable attacker
+                order = 16 * (victim & 7) + 8 * (move >> 12) - (board[start] & 7)
+                if board[start] & 7 > victim & 7 and not move >> 12 and see(pos, move) < 0:
+                    scores[move] = BAD_CAPTURE_SCORE + order
+                else:
+                    scores[move] = CAPTURE_SCORE + order
+            elif end == en_passant and board[start] & 7 == PAWN:
+                scores[move] = CAPTURE_SCORE + 16 * PAWN - PAWN
+            elif move == killer_1:
+                scores[move] = KILLER_SCORES[0]
+            elif move == killer_2:
+                scores[move] = KILLER_SCORES[1]
+            else:
+                scores[move] = history[board[start]][end]
+        moves.sort(key=scores.__getitem__, reverse=True)
+        return moves
+
+    def update_quiet_cutoff(self, pos, move, ply, depth):
+        # a quiet move caused a cutoff: remember it as a killer for this ply and raise its history score
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        piece_history = self.history[pos.board[move & 63]]
+        piece_history[move >> 6 & 63] += depth * depth
+        if piece_history[move >> 6 & 63] > HISTORY_LIMIT:
+            for scores in self.history:
+                for square in range(64):
+                    scores[square] //= 2
+
+    def ordering_stats(self):
+        return {'cutoffs': self.cutoffs, 'first_move_cutoffs': self.first_move_cutoffs,
+                'first_move_rate': self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0,
+                'quiescence_share': self.quiescence_nodes / self.nodes if self.nodes else 0}
+
+    def negamax(self, pos, depth, alpha, beta, ply, on_pv):
+        self.nodes += 1
+        self.pv[ply] = []
+        self.check_limits()
+        if self.stopped or self.is_repetition(pos):  # a repeated position is treated as a draw
+            return 0
+        if depth == 0:
+            return self.quiescence(pos, alpha, beta, ply)
+        hash_move = 0
+        entry = self.table.probe(pos.key)
+        if entry is not None:
+            entry_depth, score, bound, hash_move = entry
+            if entry_depth >= depth and not on_pv:  # cutting on the PV would leave the PV unfinished
+                score = score_from_table(score, ply)
+                if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                    return score
+        moves = bb.legal_moves(pos)
+        if not moves:
+            if bb.in_check(pos, pos.colour):
+                return -MATE + ply
+            return 0  # stalemate
+        if pos.halfmove >= 100:  # fifty-move rule
+            return 0
+
+        original_alpha = alpha
+        best, best_move = -INFINITY, 0
+        for index, move in enumerate(self.order_moves(pos, moves, ply, on_pv, hash_move)):
+            undo = make_move(pos, move)
+            self.keys.append(pos.key)
+            score = -self.negamax(pos, depth - 1, -beta, -alpha, ply + 1,
+                                  on_pv and ply < len(self.previous_pv) and move == self.previous_pv[ply])
+            self.keys.pop()
+            unmake_move(pos, undo)
+            if self.stopped:
+                return 0
+            if score > best:
+                best, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    self.pv[ply] = [move] + self.pv[ply + 1]
+                    if alpha >= beta:  # the opponent won't allow this line
+                        self.cutoffs += 1
+                        if index == 0:
+                            self.first_move_cutoffs += 1
+                        if is_quiet(pos, move):
+                            self.update_quiet_cutoff(pos, move, ply, depth)
+                        break
+        if best >= beta:
+            bound = LOWER
+        elif best > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER
+        self.table.store(pos.key, depth, score_to_table(best, ply), bound, best_move)
+        return best
+
+    def quiescence(self, pos, alpha, beta, ply):
+        # Searches only captures and promotions until the position is quiet. The side to move can stand pat (take the
+        # static evaluation) instead of capturing, except in check where every evasion is searched
+        self.nodes += 1
+        self.quiescence_nodes += 1
+        self.check_limits()
+        if self.stopped:
+            return 0
+        if ply >= MAX_PLY:
+            return ev.evaluate(pos)
+        in_check = bb.in_check(pos, pos.colour)
+        if in_check:
+            moves = bb.legal_moves(pos)
+            if not moves:
+                return -MATE + ply
+            best = stand_pat = -INFINITY
+        else:
+            stand_pat = ev.evaluate(pos)
+            if stand_pat >= beta:
+                return stand_pat
+            if stand_pat + piece_values[QUEEN] + DELTA_MARGIN < alpha:  # not even winning a queen would be enough
+                return stand_pat
+            best = stand_pat
+            alpha = max(alpha, stand_pat)
+            moves = bb.legal_moves(pos, True)
+
+        for move in self.order_moves(pos, moves, ply, False):
+            if not in_check:
+                if stand_pat + capture_gain(pos, move) + DELTA_MARGIN <= alpha:  # delta pruning
+                    continue
+                if see(pos, move) < 0:  # loses material even if it is a good capture to start with
+                    continue
+            undo = make_move(pos, move)
+            score = -self.quiescence(pos, -beta, -alpha, ply + 1)
+            unmake_move(pos, undo)
+            if self.stopped:
+                return 0
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+    def search_root(self, pos, depth):
+        # (best move, score) at a single depth. The move is None if the search was stopped before any move finished
+        self.depth = depth
+        self.pv[0] = []
+        moves = self.order_moves(pos, bb.legal_moves(pos), 0, True)
+        best_move, alpha = None, -INFINITY
+        for move in moves:
+            undo = make_move(pos, move)
+            self.keys.append(pos.key)
+            score = -self.negamax(pos, depth - 1, -INFINITY, -alpha, 1,
+                                  bool(self.previous_pv) and move == self.previous_pv[0])
+            self.keys.pop()
+            unmake_move(pos, undo)
+            if self.stopped:
+                break
+            if score > alpha:
+                best_move, alpha = move, score
+                self.pv[0] = [move] + self.pv[1]
+        if best_move is not None:
+            # stopped part way through, the moves not searched could be better, so the score is only a lower bound
+            self.table.store(pos.key, depth, score_to_table(alpha, 0), LOWER if self.stopped else EXACT, best_move)
+        return best_move, alpha
+
+    def iterative_deepening(self, pos, first_depth=1):
+        # first_depth lets helper searches in lazy_smp.py start a depth ahead of the main one
+        self.start_time = time.perf_counter()
+        if self.movetime is not None:
+            self.deadline = self.start_time + self.movetime
+        self.keys.append(pos.key)
+        self.table.new_search()
+        moves = bb.legal_moves(pos)
+        if not moves:
+            return None, -MATE if bb.in_check(pos, pos.colour) else 0
+        best_move, best_score = moves[0], 0
+        for depth in range(first_depth, self.max_depth + 1):
+            move, score = self.search_root(pos, depth)
+            if self.stopped:  # an unfinished depth can't be trusted, keep the last finished one
+                break
+            best_move, best_score = move, score
+            self.previous_pv = self.pv[0][:]
+            if self.report is not None:
+                self.report(depth, score, self.previous_pv, self.nodes, time.perf_counter() - self.start_time)
+            if abs(score) > MATE_BOUND:  # a forced mate was found, deeper searches won't find a quicker one
+                break
+        return best_move, best_score
+
+
+def search(position, depth=None, movetime=None, nodes=None, history=(), table=None):
+    # Best move (an int from position.encode_move) and its score. position is a FEN string or a Position, which is
+    # left unchanged. movetime is in seconds and history the keys of the positions before this one in the game
+    if isinstance(position, str):
+        pos = Position.from_fen(position)
+    else:
+        pos = position.copy()
+    return Search(depth, movetime, nodes, history, table).iterative_deepening(pos)
+
+
+transposition_table = None  # made on the first search and kept so later moves reuse what earlier searches found
+
+
+def run_evaluation(position, depth=None, movetime=1, nodes=None):
+    # The evaluation shown in the panel: pawns from white's point of view, or +/- inf when there is a forced mate.
+    # Searches deeper until it runs out of time (seconds), or reaches the depth (half moves) or node limit
+    global transposition_table
+    if transposition_table is None:
+        transposition_table = TranspositionTable()
+    pos = Position.from_fen(position)
+    move, score = search(pos, depth, movetime, nodes, table=transposition_table)
+    return display_score(score, pos.colour)
+
+
+def display_score(score, colour):
+    # a search score (centipawns for colour, the side to move) as shown in the panel: pawns from white's point of
+    # view, or +/- inf for a forced mate
+    if colour == BLACK:
+        score = -score
+    if abs(score) > MATE_BOUND:
+        return float('inf') if score > 0 else float('-inf')
+    return round(score / 100, 1) + 0.0  # adding 0.0 turns the -0.0 that rounds from -1 to -4 centipawns into 0.0
@@ -0,0 +1,72 @@
+# Runs engine searches on a background thread so the GUI keeps drawing and handling clicks while the engine thinks.
+# Each finished depth and the final result are put on a queue that the GUI reads once a frame. A position in the
+# opening book (see book.py) isn't searched, the book move is sent instead. Starting a new search
+# or cancelling stops the one running. Messages from a search that was stopped are dropped, so the panel only ever
+# shows the position on the board.
+
+import queue
+import threading
+
+from position import Position
+from search import Search
+from transposition import TranspositionTable
+
+DEPTH, DONE, BOOK = 'depth', 'done', 'book'  # message kinds
+
+
+class SearchThread:
+    def __init__(self, movetime=5, table=None, book=None):
+        self.movetime = movetime  # seconds per search
+        self.table = table if table is not None else TranspositionTable()  # kept between searches
+        self.book = book  # OpeningBook, or None to always search
+        self.messages = queue.Queue()
+        self.searcher = None
+        self.thread = None
+        self.generation = 0  # counts searches started, so messages can be matched to the search that sent them
+
+    def start(self, fen, history=()):
+        # Starts searching the position (a FEN), stopping any search still running. history is the Zobrist keys of
+        # the earlier positions in the game, for repetitions
+        self.cancel()
+        self.generation += 1
+        generation = self.generation
+        pos = Position.from_fen(fen)
+        move = self.book.choose(pos) if self.book is not None else None
+        if move is not None:
+            self.messages.put((generation, BOOK, (move, pos.colour)))
+            return
+
+        def report(depth, score, pv, nodes, seconds):
+            self.messages.put((generation, DEPTH, (depth, score, pv, nodes, seconds, pos.colour)))
+
+        self.searcher = Search(movetime=self.movetime, history=history, table=self.table, report=report)
+        self.thread = threading.Thread(target=self.run, args=(self.searcher, pos, generation), daemon=True)
+        self.thread.start()
+
+    def run(self, searcher, pos, generation):
+        move, score = searcher.iterative_deepening(pos)
+        self.messages.put((generation, DONE, (move, score, pos.colour)))
+
+    def cancel(self):
+        # Stops the running search, if there is one. The search checks stopped at every node, so this is quick
+        if self.thread is not None:
+            self.searcher.stopped = True
+            self.thread.join()
+            self.thread = None
+            self.generation += 1  # anything it put on the queue is now out of date
+
+    def thinking(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def poll(self):
+        # (kind, details) for each message from the current search since the last poll, without waiting.
+        # DEPTH details are (depth, score, pv, nodes, seconds, colour), DONE details (move, score, colour) and BOOK
+        # details (move, colour). Scores are centipawns for colour, the side to move
+        messages = []
+        while True:
+            try:
+                generation, kind, details = self.messages.get_nowait()
+            except queue.Empty:
+                return messages
+            if generation == self.generation:
+                messages.append((kind, details))
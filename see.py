@@ -0,0 +1,63 @@
+# Static exchange evaluation: the material a capture wins or loses once every piece that can recapture on the square
+# has had its turn. Each side recaptures with its least valuable attacker and can stop whenever carrying on would lose
+# material. No moves are made or generated. Attackers come from bitboard.attackers_to and, as each one is taken off
+# the occupied bitboard, the sliders lined up behind it (x-rays) are added.
+# Pins and checks are ignored, so the answer is an estimate, but it is cheap enough to run on every capture.
+
+from bitboard import attackers_to, bishop_attacks, rook_attacks, PROMOTION_ROWS
+from position import EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE
+from psqt import piece_values
+
+see_values = piece_values[:KING] + [20000]  # a king is never captured, but it is the last piece to recapture with
+
+
+def see(pos, move, values=see_values):
+    # centipawns won (or lost if negative) by the side to move playing the capture or promotion
+    start, end, promotion = move & 63, move >> 6 & 63, move >> 12
+    board, pieces = pos.board, pos.pieces
+    occupied = pos.occupied[0] | pos.occupied[1]
+    piece = board[start]
+    victim = board[end]
+    if victim == EMPTY and piece & 7 == PAWN and end == pos.en_passant:  # the captured pawn is beside the end square
+        victim = PAWN
+        occupied ^= 1 << (end + 8 if pos.colour == WHITE else end - 8)
+    gains = [values[victim & 7]]
+    on_square = values[piece & 7]  # value of the piece that would be captured next
+    if promotion:
+        gains[0] += values[promotion] - values[PAWN]
+        on_square = values[promotion]
+
+    diagonal = pieces[BISHOP] | pieces[BISHOP | 8] | pieces[QUEEN] | pieces[QUEEN | 8]
+    straight = pieces[ROOK] | pieces[ROOK | 8] | pieces[QUEEN] | pieces[QUEEN | 8]
+    promotes = 1 << end & PROMOTION_ROWS
+    occupied ^= 1 << start
+    attackers = attackers_to(pos, end, occupied)
+    colour = pos.colour ^ 1
+    while True:
+        own = attackers & pos.occupied[colour]
+        if not own:
+            break
+        for piece_type in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            candidates = own & pieces[piece_type | colour << 3]
+            if candidates:
+                break
+        if piece_type == KING and attackers & pos.occupied[colour ^ 1]:  # the king can't capture a defended piece
+            break
+        gain = on_square - gains[-1]
+        on_square = values[piece_type]
+        if piece_type == PAWN and promotes:
+            gain += values[QUEEN] - values[PAWN]
+            on_square = values[QUEEN]
+        gains.append(gain)
+        occupied ^= candidates & -candidates
+        if piece_type in (PAWN, BISHOP, QUEEN):
+            attackers |= bishop_attacks(end, occupied) & diagonal
+        if piece_type in (ROOK, QUEEN):
+            attackers |= rook_attacks(end, occupied) & straight
+        attackers &= occupied
+        colour ^= 1
+
+    # each side only carries on with the exchange when that is better for it than stopping
+    for i in range(len(gains) - 1, 0, -1):
+        gains[i - 1] = -max(-gains[i - 1], gains[i])
+    return gains[0]
@@ -0,0 +1,20 @@
+import pytest
+
+from pgn import move_from_san, read_games
+from position import Position
+
+
+def test_pawn_push_to_own_back_row_is_illegal():
+    pos = Position.from_fen('4k3/8/8/8/8/8/8/K7 w - - 0 1')
+    with pytest.raises(ValueError):
+        move_from_san(pos, 'e1')
+    pos = Position.from_fen('4k3/8/8/8/8/8/8/K7 b - - 0 1')
+    with pytest.raises(ValueError):
+        move_from_san(pos, 'e8')
+
+
+def test_bad_move_is_kept_as_the_game_error():
+    lines = ['[FEN "4k3/8/8/8/8/8/8/K7 w - - 0 1"]', '', '1. e1 Kd7 *', '', '[White "next"]', '', '1. e4 e5 *']
+    bad, good = read_games(lines)
+    assert bad.moves == [] and 'ply 1' in bad.error
+    assert len(good.moves) == 2 and good.error is None
@@ -0,0 +1,113 @@
+# Transposition table: remembers what the search found for a position (by Zobrist key) so a position reached by a
+# different move order isn't searched again. The memory is fixed when the table is made.
+#
+# Entries are two 64-bit words kept in two arrays, the key XOR the packed data and the packed data:
+#   bits 0-15 best move, 16-23 depth, 24-25 bound, 26-31 age, 32-63 score + 2^31
+# The score offset means a stored entry's data is never 0, so 0 marks an empty slot.
+# Storing the key XOR the data means that when processes share the table (lazy_smp.py) without locks and one reads an
+# entry while another is half way through writing it, the key doesn't match and the entry is ignored.
+# Positions map to a bucket of two slots. The first keeps the deepest result (unless it is from an earlier search),
+# the second is always replaced, so recent shallow results don't push out expensive deep ones.
+
+from array import array
+
+EXACT, LOWER, UPPER = 0, 1, 2  # score is exact, at least (failed high) or at most (failed low)
+ENTRY_BYTES = 16
+BUCKET_SIZE = 2
+SCORE_OFFSET = 1 << 31
+
+
+def pack(depth, score, bound, move, age):
+    return move | depth << 16 | bound << 24 | age << 26 | (score + SCORE_OFFSET) << 32
+
+
+def unpack(data):  # (depth, score, bound, move)
+    return data >> 16 & 255, (data >> 32) - SCORE_OFFSET, data >> 24 & 3, data & 0xFFFF
+
+
+def table_bytes(size_mb):  # bytes of memory a table of size_mb uses, for making a shared memory block to hold it
+    return max(1, int(size_mb * 1024 * 1024) // (ENTRY_BYTES * BUCKET_SIZE)) * ENTRY_BYTES * BUCKET_SIZE
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16, buffer=None):
+        # buffer is memory to keep the entries in (e.g. SharedMemory.buf), at least table_bytes(size_mb) long and
+        # zeroed for a new table. Without it the table has its own
+        self.size_mb = size_mb
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // (ENTRY_BYTES * BUCKET_SIZE))
+        slots = BUCKET_SIZE * self.buckets
+        if buffer is None:
+            self.keys = array('Q', bytes(8 * slots))
+            self.data = array('Q', bytes(8 * slots))
+        else:
+            words = memoryview(buffer).cast('B')[:16 * slots].cast('Q')
+            self.keys = words[:slots]
+            self.data = words[slots:]
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0  # probes where the bucket was full of other positions
+        self.stores = 0
+        self.overwrites = 0  # stores that threw away a different position
+
+    def clear(self):
+        empty = array('Q', bytes(8 * BUCKET_SIZE * self.buckets))
+        self.keys[:] = empty
+        self.data[:] = empty
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = self.hits = self.collisions = self.stores = self.overwrites = 0
+
+    def new_search(self):  # entries from earlier searches can then be replaced whatever their depth
+        self.age = (self.age + 1) & 63
+
+    def probe(self, key):
+        # (depth, score, bound, move) stored for the position, or None
+        self.probes += 1
+        index = key % self.buckets * BUCKET_SIZE
+        keys, data = self.keys, self.data
+        first, second = data[index], data[index + 1]  # read once so each is checked and unpacked as the same value
+        if first and keys[index] ^ first == key:
+            self.hits += 1
+            return unpack(first)
+        if second and keys[index + 1] ^ second == key:
+            self.hits += 1
+            return unpack(second)
+        if first and second:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        self.stores += 1
+        index = key % self.buckets * BUCKET_SIZE
+        keys, data = self.keys, self.data
+        first = data[index]
+        first_key = keys[index] ^ first
+        if first_key != key and keys[index + 1] ^ data[index + 1] == key:  # update the slot the position is already in
+            index += 1
+        elif first_key != key and first:
+            stored_depth = first >> 16 & 255
+            stored_age = first >> 26 & 63
+            if depth < stored_depth and stored_age == self.age:  # keep the deeper entry, use the other slot
+                index += 1
+        if data[index] and keys[index] ^ data[index] != key:
+            self.overwrites += 1
+        entry = pack(depth, score, bound, move, self.age)
+        keys[index] = key ^ entry
+        data[index] = entry
+
+    def close(self):  # lets go of a buffer passed in, so the shared memory holding it can be closed
+        if isinstance(self.keys, memoryview):
+            self.keys.release()
+            self.data.release()
+
+    def usage(self):  # permille of slots filled by the current search, from a sample at the start of the table
+        sample = min(1000, len(self.data))
+        return sum(1 for data in self.data[:sample] if data and data >> 26 & 63 == self.age) * 1000 // sample
+
+    def stats(self):
+        return {'size_mb': self.size_mb, 'probes': self.probes, 'hits': self.hits,
+                'hit_rate': self.hits / self.probes if self.probes else 0, 'collisions': self.collisions,
+                'stores': self.stores, 'overwrites': self.overwrites, 'usage': self.usage()}
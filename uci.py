@@ -0,0 +1,247 @@
+# UCI (Universal Chess Interface) front end, so the engine can be used from chess GUIs and tournament managers:
+#
+#   python uci.py
+#
+# Commands are read from stdin and answers written to stdout. Searches run on a thread so stop and isready are
+# answered while the engine thinks. With the Threads option above 1 the search is lazy SMP (see lazy_smp.py), the
+# extra threads being helper processes sharing the hash table. With a Polyglot book set by the BookFile option, book
+# moves are played straight away without searching. Nothing here imports the GUI, so pygame isn't needed.
+
+import sys
+import threading
+from multiprocessing import shared_memory
+
+from book import OpeningBook
+from lazy_smp import Helpers
+from position import Position, START_FEN, make_move, move_from_uci, move_to_uci
+from search import Search, MATE, MATE_BOUND
+from transposition import TranspositionTable, table_bytes
+
+NAME = 'ChessEngine'
+AUTHOR = 'NeuralNacho'
+DEFAULT_HASH, MAX_HASH = 16, 1024  # MB
+MAX_THREADS = 64
+MOVES_TO_GO = 30  # moves the rest of the clock time is shared between when the GUI doesn't say
+SAFETY_MARGIN = 0.05  # seconds kept back for answering
+
+
+def score_text(score):  # 'cp 35', or 'mate 3' / 'mate -2' counted in moves
+    if score > MATE_BOUND:
+        return 'mate %d' % ((MATE - score + 1) // 2)
+    if score < -MATE_BOUND:
+        return 'mate %d' % -((MATE + score + 1) // 2)
+    return 'cp %d' % score
+
+
+def parse_go(words):  # the go arguments as a dict, e.g. {'depth': 6} or {'wtime': 60000, 'infinite': True}
+    limits = {}
+    i = 0
+    while i < len(words):
+        word = words[i]
+        if word in ('infinite', 'ponder'):  # pondering is searched like infinite
+            limits[word] = True
+        elif word == 'searchmoves':  # the rest of the line is moves, which this engine doesn't restrict to
+            break
+        elif i + 1 < len(words):
+            limits[word] = int(words[i + 1])
+            i += 1
+        i += 1
+    return limits
+
+
+def think_time(limits, colour):
+    # seconds to search for with a clock: an equal share of what is left over the moves still to play, plus most of
+    # the increment, never more than half what is left
+    left = limits.get('wtime' if colour == 0 else 'btime')
+    if left is None:
+        return None
+    increment = limits.get('winc' if colour == 0 else 'binc', 0)
+    moves_to_go = limits.get('movestogo', MOVES_TO_GO)
+    seconds = left / 1000 / moves_to_go + 0.8 * increment / 1000
+    return max(0.01, min(seconds, left / 2000) - SAFETY_MARGIN)
+
+
+class UciEngine:
+    def __init__(self, output=None):
+        self.output = output or self.write
+        self.output_lock = threading.Lock()
+        self.pos = Position.from_fen(START_FEN)
+        self.history = []  # keys of the positions before self.pos
+        self.hash_mb = DEFAULT_HASH
+        self.threads = 1
+        self.memory = None  # SharedMemory holding the table when there are helper processes
+        self.table = None
+        self.helpers = None  # the helper processes, started with the table and kept until it changes
+        self.searcher = None
+        self.thread = None
+        self.stop_event = threading.Event()  # set by stop, for go infinite which mustn't answer before it
+        self.book = None  # OpeningBook from the BookFile option
+        self.own_book = True
+
+    @staticmethod
+    def write(line):
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+    def send(self, line):
+        with self.output_lock:
+            self.output(line)
+
+    def make_table(self):
+        self.free_table()
+        if self.threads > 1:
+            self.memory = shared_memory.SharedMemory(create=True, size=table_bytes(self.hash_mb))
+            self.table = TranspositionTable(self.hash_mb, self.memory.buf)
+            self.helpers = Helpers(self.memory, self.hash_mb, self.threads - 1)
+        else:
+            self.table = TranspositionTable(self.hash_mb)
+
+    def free_table(self):
+        if self.helpers is not None:
+            self.helpers.close()
+            self.helpers = None
+        if self.table is not None:
+            self.table.close()
+            self.table = None
+        if self.memory is not None:
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+    def handle(self, line):  # runs one command. Returns False for quit
+        words = line.split()
+        if not words:
+            return True
+        command, arguments = words[0], words[1:]
+        if command == 'uci':
+            self.send('id name %s' % NAME)
+            self.send('id author %s' % AUTHOR)
+            self.send('option name Hash type spin default %d min 1 max %d' % (DEFAULT_HASH, MAX_HASH))
+            self.send('option name Threads type spin default 1 min 1 max %d' % MAX_THREADS)
+            self.send('option name OwnBook type check default true')
+            self.send('option name BookFile type string default <empty>')
+            self.send('uciok')
+        elif command == 'isready':
+            self.send('readyok')
+        elif command == 'setoption':
+            self.set_option(arguments)
+        elif command == 'ucinewgame':
+            self.stop()
+            self.make_table()
+        elif command == 'position':
+            self.stop()
+            self.set_position(arguments)
+        elif command == 'go':
+            self.stop()
+            self.go(parse_go(arguments))
+        elif command == 'stop':
+            self.stop()
+        elif command == 'quit':
+            self.stop()
+            self.free_table()
+            self.set_book(None)
+            return False
+        return True
+
+    def set_option(self, words):  # setoption name <name> value <value>
+        if 'name' not in words or 'value' not in words:
+            return
+        name = ' '.join(words[words.index('name') + 1:words.index('value')]).lower()
+        value = ' '.join(words[words.index('value') + 1:])
+        self.stop()
+        if name in ('hash', 'threads'):
+            try:
+                number = int(value)
+            except ValueError:
+                self.send('info string %s must be a whole number, not %r' % (name, value))
+                return
+            if name == 'hash':
+                self.hash_mb = max(1, min(MAX_HASH, number))
+            else:
+                self.threads = max(1, min(MAX_THREADS, number))
+            self.make_table()
+        elif name == 'ownbook':
+            self.own_book = value.lower() == 'true'
+        elif name == 'bookfile':
+            self.set_book(None if value in ('', '<empty>') else value)
+
+    def set_book(self, path):
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+        if path is not None:
+            try:
+                self.book = OpeningBook(path)
+            except OSError as error:
+                self.send('info string cannot open book %s: %s' % (path, error))
+
+    def set_position(self, words):  # position startpos|fen <fen> [moves <move> ...]
+        moves = words.index('moves') if 'moves' in words else len(words)
+        if words and words[0] == 'fen':
+            pos = Position.from_fen(' '.join(words[1:moves]))
+        else:
+            pos = Position.from_fen(START_FEN)
+        history = []
+        for text in words[moves + 1:]:
+            history.append(pos.key)
+            make_move(pos, move_from_uci(text))
+        self.pos, self.history = pos, history
+
+    def go(self, limits):
+        if self.book is not None and self.own_book and not limits.get('infinite') and not limits.get('ponder'):
+            move = self.book.choose(self.pos)
+            if move is not None:  # no search at all while the game is in the book
+                self.send('info string book move')
+                self.send('bestmove %s' % move_to_uci(move))
+                return
+        if self.table is None:
+            self.make_table()
+        movetime = limits['movetime'] / 1000 if 'movetime' in limits else think_time(limits, self.pos.colour)
+        if limits.get('infinite'):
+            movetime = None
+        self.stop_event.clear()
+        self.searcher = Search(limits.get('depth'), movetime, limits.get('nodes'), self.history, self.table,
+                               self.report)
+        self.thread = threading.Thread(target=self.think, args=(self.searcher, self.pos.copy(), limits), daemon=True)
+        self.thread.start()
+
+    def think(self, searcher, pos, limits):
+        helpers = self.helpers
+        if helpers is not None:  # the helpers share the table, so they search at the age the main search will use
+            helpers.start(pos.to_fen(), self.history, (self.table.age + 1) & 63)
+        try:
+            move, score = searcher.iterative_deepening(pos)
+        finally:
+            if helpers is not None:
+                helpers.stop()  # not waited for, they are done with by the time the next search starts
+        if limits.get('infinite'):  # the answer has to wait for stop
+            self.stop_event.wait()
+        self.send('bestmove %s' % (move_to_uci(move) if move is not None else '0000'))
+
+    def report(self, depth, score, pv, nodes, seconds):
+        self.send('info depth %d score %s nodes %d nps %d time %d hashfull %d pv %s'
+                  % (depth, score_text(score), nodes, nodes / seconds if seconds else 0, seconds * 1000,
+                     self.table.usage(), ' '.join(move_to_uci(move) for move in pv)))
+
+    def stop(self):  # stops the search if one is running and waits for its bestmove
+        if self.thread is not None:
+            self.searcher.stopped = True
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+
+def main():
+    engine = UciEngine()
+    for line in sys.stdin:
+        if not engine.handle(line):
+            break
+    else:
+        engine.stop()
+        engine.free_table()
+        engine.set_book(None)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
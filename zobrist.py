@@ -0,0 +1,46 @@
+# Zobrist hashing. A position's key is the XOR of a random 64-bit number for every (piece, square) on the board, one
+# for black to move, one for the castling rights and one for the en passant file. Position keeps its key up to date as
+# moves are made (each change is one or two XORs) and compute_key works it out from scratch to check against.
+# The pawn key only has the pawns in it, for the pawn structure cache in pawns.py.
+
+import random
+
+generator = random.Random(20231105)  # fixed seed so keys are the same in every process and every run
+
+
+def random_key():
+    return generator.getrandbits(64)
+
+
+piece_keys = [[random_key() for _ in range(64)] for _ in range(16)]  # indexed by piece code then square
+black_to_move_key = random_key()
+castling_right_keys = [random_key() for _ in range(4)]
+# castling_keys[rights] for every combination of the four castling rights bits
+castling_keys = [0] * 16
+for rights in range(16):
+    for bit in range(4):
+        if rights >> bit & 1:
+            castling_keys[rights] ^= castling_right_keys[bit]
+en_passant_keys = [random_key() for _ in range(8)]  # indexed by file
+# the piece keys of the pawns and 0 for everything else, so updating the pawn key doesn't need to check the piece
+pawn_keys = [piece_keys[piece] if piece & 7 == 1 else [0] * 64 for piece in range(16)]
+
+
+def compute_key(pos):
+    key = 0
+    for square, piece in enumerate(pos.board):
+        if piece:
+            key ^= piece_keys[piece][square]
+    if pos.colour:  # black to move
+        key ^= black_to_move_key
+    key ^= castling_keys[pos.castling]
+    if pos.en_passant is not None:
+        key ^= en_passant_keys[pos.en_passant & 7]
+    return key
+
+
+def compute_pawn_key(pos):
+    key = 0
+    for square, piece in enumerate(pos.board):
+        key ^= pawn_keys[piece][square]
+    return key